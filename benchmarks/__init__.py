@@ -0,0 +1,10 @@
+# Define a list of public objects that will be imported when a client imports this package
+# using the "from module import *" syntax
+__all__ = ['ReplayAdapter',
+           'installed',
+           'measure']
+
+# Import the offline stand-in for Alpha Vantage, Yahoo Finance and the news sites from the 'replay' module
+from .replay import ReplayAdapter, installed
+# Import the timing helper from the 'timing' module
+from .timing import measure
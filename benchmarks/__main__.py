@@ -0,0 +1,160 @@
+"""
+Offline benchmarks of the app
+
+Run every benchmark against the replayed APIs and write the results as JSON:
+    python -m benchmarks run --output results.json
+Compare the results of two commits:
+    python -m benchmarks compare before.json after.json
+Record real responses as fixtures for later runs (needs the API keys in .streamlit/secrets.toml):
+    python -m benchmarks record AAPL MSFT --fixtures benchmarks/recorded
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from . import e2e, startup
+from .replay import ReplayAdapter, installed
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=e2e.ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(args: argparse.Namespace):
+    # the micro benchmarks change the working directory, a relative output path is the caller's
+    output = os.path.abspath(args.output)
+    config = {'tickers': args.tickers, 'sessions': args.sessions, 'latency': args.latency, 'jitter': args.jitter,
+              'calls_per_minute': args.calls_per_minute,
+              'fixtures': os.path.abspath(args.fixtures) if args.fixtures else None}
+    results = {'commit': commit(),
+               'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+               'python': sys.version.split()[0],
+               'platform': platform.platform(),
+               'config': dict(config, repeat=args.repeat)}
+    if not args.skip_startup:
+        results['startup'] = startup.run(repeat=args.startup_repeat)
+    if not args.skip_micro:
+        # the micro benchmarks import the app in this process
+        os.chdir(e2e.ROOT)
+        sys.path.insert(0, e2e.ROOT)
+        from . import micro
+        results['micro'] = micro.run(repeat=args.micro_repeat)
+    if not args.skip_e2e:
+        results['e2e'] = e2e.run(config, repeat=args.repeat)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'Wrote {output}')
+
+
+def medians(results: dict, prefix: str = '') -> dict:
+    # the median of every timing in a results file, keyed by its path
+    found = {}
+    for name, value in results.items():
+        if isinstance(value, dict) and 'median_ms' in value:
+            found[prefix + name] = value['median_ms']
+        elif isinstance(value, dict) and name not in ('config', 'upstream'):
+            found.update(medians(value, f'{prefix}{name}.'))
+    return found
+
+
+def compare(args: argparse.Namespace):
+    with open(args.before) as file:
+        before = medians(json.load(file))
+    with open(args.after) as file:
+        after_results = json.load(file)
+    after = medians(after_results)
+    regressions = 0
+    print(f"{'benchmark':60} {'before ms':>12} {'after ms':>12} {'change':>8}")
+    for name in sorted(set(before) & set(after)):
+        change = after[name] / before[name] - 1 if before[name] else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  slower'
+            regressions += 1
+        elif change < -args.threshold:
+            flag = '  faster'
+        print(f'{name:60} {before[name]:12.3f} {after[name]:12.3f} {change:+8.1%}{flag}')
+    # a library that is loaded at startup again is a regression, however fast it imported on this machine
+    deferred = after_results.get('startup', {}).get('loaded_deferred', [])
+    if deferred:
+        print(f"imported at startup instead of on first use: {', '.join(deferred)}")
+        regressions += 1
+    # a non-zero exit code lets a CI job fail on a regression
+    sys.exit(1 if regressions else 0)
+
+
+def record(args: argparse.Namespace):
+    # call the real services once for every endpoint the app uses and save the responses as fixtures
+    os.chdir(e2e.ROOT)
+    sys.path.insert(0, e2e.ROOT)
+    import streamlit as st
+    import yfinance as yf
+    from alpha_vantage.fundamentaldata import FundamentalData
+    from alpha_vantage.sectorperformance import SectorPerformances
+    from alpha_vantage.timeseries import TimeSeries
+    from services.http import TIMEOUT, get_session
+
+    key = st.secrets['alpha_vantage']
+    with installed(ReplayAdapter(fixture_dir=args.fixtures, record=True)):
+        fd = FundamentalData(key=key)
+        ts = TimeSeries(key=key)
+        for ticker in args.tickers:
+            fd.get_company_overview(ticker)
+            fd.get_income_statement_annual(ticker)
+            fd.get_balance_sheet_annual(ticker)
+            fd.get_cash_flow_annual(ticker)
+            ts.get_weekly_adjusted(ticker)
+            ts.get_daily_adjusted(ticker, outputsize='compact')
+            for item in yf.Ticker(ticker).get_news()[:args.articles]:
+                get_session().get(item['link'], timeout=TIMEOUT)
+        SectorPerformances(key=key).get_sector()
+        get_session().get('https://www.alphavantage.co/query', params={'function': 'LISTING_STATUS', 'apikey': key},
+                          timeout=60)
+    print(f'Recorded fixtures in {args.fixtures}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Offline benchmarks of the app.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks against the replayed APIs')
+    run_parser.add_argument('--output', default='benchmark.json', help='the JSON file the results are written to')
+    run_parser.add_argument('--tickers', nargs='+', default=['AAPL'], help='the tickers the pages show')
+    run_parser.add_argument('--sessions', type=int, default=8, help='the number of concurrent sessions')
+    run_parser.add_argument('--latency', type=float, default=0.05, help='seconds every replayed request takes')
+    run_parser.add_argument('--jitter', type=float, default=0.0, help='random +/- seconds added to the latency')
+    run_parser.add_argument('--calls-per-minute', type=float, default=None,
+                            help='Alpha Vantage quota to simulate (and to configure the app with), none by default')
+    run_parser.add_argument('--fixtures', default=None,
+                            help='a directory of recorded fixtures, endpoints without one are generated')
+    run_parser.add_argument('--repeat', type=int, default=3, help='end-to-end runs, each in a fresh process')
+    run_parser.add_argument('--micro-repeat', type=int, default=20, help='timed calls per micro benchmark')
+    run_parser.add_argument('--startup-repeat', type=int, default=5, help='imports of the app, each in a fresh process')
+    run_parser.add_argument('--skip-startup', action='store_true', help='do not run the startup benchmarks')
+    run_parser.add_argument('--skip-micro', action='store_true', help='do not run the micro benchmarks')
+    run_parser.add_argument('--skip-e2e', action='store_true', help='do not run the end-to-end benchmarks')
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help='compare the medians of two result files')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='the relative change that counts as a regression or an improvement')
+    compare_parser.set_defaults(handler=compare)
+
+    record_parser = commands.add_parser('record', help='record real API responses as fixtures')
+    record_parser.add_argument('tickers', nargs='+')
+    record_parser.add_argument('--fixtures', required=True, help='the directory the fixtures are written to')
+    record_parser.add_argument('--articles', type=int, default=3, help='news articles recorded per ticker')
+    record_parser.set_defaults(handler=record)
+
+    args = parser.parse_args()
+    args.handler(args)
@@ -0,0 +1,222 @@
+import argparse
+import importlib
+import json
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+from streamlit.runtime.scriptrunner import ScriptRunContext, add_script_run_ctx
+from streamlit.runtime.state import SafeSessionState, SessionState
+from streamlit.runtime.uploaded_file_manager import UploadedFileManager
+
+from . import fixtures
+from .replay import ReplayAdapter, installed
+from .timing import summarize
+
+
+# the repository root, where the app runs from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'main.py')
+# the tabs of the app, the first one is what a visitor sees first
+TABS = ['About the Company', 'Stock Price Chart', 'Balance Sheet', 'Income Statement', 'Statement of Cash Flow',
+        'Ratios', 'Peers', 'News']
+# the longest time to wait for the background prefetches of a page
+SETTLE_TIMEOUT = 120
+# the number of measured loads of every tab
+TAB_LOADS = 3
+# the number of companies screened before the measurement, the Peers tab compares the ticker of the pages with them
+# (the replayed overviews all share one industry)
+PEERS = 60
+
+
+def new_session() -> ScriptRunContext:
+    # the per-session state Streamlit keeps for a browser tab, without a browser: the messages of the page
+    # are built (so tables are rendered) and then dropped
+    return ScriptRunContext(session_id=uuid.uuid4().hex,
+                            _enqueue=lambda message: None,
+                            query_string='',
+                            session_state=SafeSessionState(SessionState()),
+                            uploaded_file_mgr=UploadedFileManager(),
+                            page_script_hash='',
+                            user_info={'email': None})
+
+
+def load_page(session: ScriptRunContext, widgets: Dict[str, object]) -> float:
+    # run the app script once for a session, like Streamlit does on a page load or a rerun,
+    # with the given widget values, and return how long the script ran
+    result = {}
+
+    def script_run():
+        session.reset()
+        for key, value in widgets.items():
+            session.session_state[key] = value
+        start = time.perf_counter()
+        try:
+            runpy.run_path(SCRIPT, run_name='__main__')
+        except Exception as error:
+            result['error'] = error
+        result['seconds'] = time.perf_counter() - start
+        session.session_state.on_script_finished(session.widget_ids_this_run)
+
+    thread = threading.Thread(target=script_run, name='ScriptRunner.scriptThread')
+    add_script_run_ctx(thread, session)
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['seconds']
+
+
+def concurrent_loads(pages: List[Dict[str, object]]) -> dict:
+    # load one page per new session at the same time and return the time of each page and of all of them
+    seconds = [0.0] * len(pages)
+    errors = []
+
+    def visit(number: int):
+        try:
+            seconds[number] = load_page(new_session(), pages[number])
+        except Exception as error:
+            errors.append(error)
+
+    start = time.perf_counter()
+    visitors = [threading.Thread(target=visit, args=(number,)) for number in range(len(pages))]
+    for visitor in visitors:
+        visitor.start()
+    for visitor in visitors:
+        visitor.join()
+    wall = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return {'pages': summarize(seconds), 'wall_ms': round(wall * 1000, 4)}
+
+
+def settle(timeout: float = SETTLE_TIMEOUT):
+    # wait for the background prefetches of the pages, so they do not run during the next measurement
+    prefetch = importlib.import_module('services.prefetch')
+    deadline = time.monotonic() + timeout
+    while prefetch.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def page(ticker: str, tab: str = TABS[0]) -> Dict[str, object]:
+    # the widget values of a visitor who searched for the ticker and opened the tab
+    return {'ticker_query': ticker, 'selected_tab': tab}
+
+
+def screen_peers(config: dict, tickers: List[str]):
+    # run the screener's pipeline over the tickers in this process, so the app finds the statements, companies and
+    # cross-section panels it would find after a nightly run, without the simulated latency and quota of the pages
+    screener = importlib.import_module('screener')
+    panel_dir = importlib.import_module('services.panel').PANEL_DIR
+    parts_dir = os.path.join(panel_dir, 'parts')
+    os.makedirs(parts_dir, exist_ok=True)
+    gateway = importlib.import_module('services').get_gateway()
+    calls_per_minute = gateway.calls_per_minute
+    gateway.set_quota(10 ** 6)
+    try:
+        with installed(ReplayAdapter(fixture_dir=config['fixtures'])):
+            since = time.time()
+            for ticker in tickers:
+                screener.checkpoint_ticker(ticker, parts_dir, retries=0, since=since)
+    finally:
+        gateway.set_quota(calls_per_minute)
+    screener.write_panel(panel_dir, parts_dir, tickers, updated=tickers)
+
+
+def single_session(config: dict, adapter: ReplayAdapter) -> dict:
+    # a cold and a warm page load of one ticker, a rerun of the same session and every tab once the caches are warm
+    ticker = config['tickers'][0]
+    results = {}
+    # the peers are screened before the first page, which loads the panels once per process,
+    # the ticker of the pages is not one of them, so its other tabs still fetch from the replay
+    screen_peers(config, [f'PEER{number:02d}' for number in range(PEERS)])
+    adapter.reset()
+    results['cold_page'] = load_page(new_session(), page(ticker))
+    results['cold_page_upstream'] = adapter.stats()
+    settle()
+    adapter.reset()
+    session = new_session()
+    results['warm_page'] = load_page(session, page(ticker))
+    results['rerun'] = load_page(session, page(ticker))
+    # the tabs are measured without the prefetch of the first page running next to them
+    settle()
+    for tab in TABS:
+        load_page(session, page(ticker, tab))
+        # the median of a few loads, so a full garbage collection that happens to run in one does not decide the number
+        results[f'tab[{tab}]'] = statistics.median(load_page(session, page(ticker, tab)) for _ in range(TAB_LOADS))
+    settle()
+    results['warm_page_upstream'] = adapter.stats()
+    return results
+
+
+def many_sessions(config: dict, adapter: ReplayAdapter) -> dict:
+    # N sessions opening the first tab at the same time, first with cold caches and then with warm ones,
+    # the tickers are taken in turn, so N sessions of one ticker show how well identical requests are shared
+    pages = [page(config['tickers'][number % len(config['tickers'])]) for number in range(config['sessions'])]
+    results = {}
+    adapter.reset()
+    results['cold_sessions'] = concurrent_loads(pages)
+    results['cold_sessions_upstream'] = adapter.stats()
+    settle()
+    results['warm_sessions'] = concurrent_loads(pages)
+    return results
+
+
+def child(config: dict) -> dict:
+    # one measurement in a fresh process with empty caches, so every cold number is really cold
+    adapter = ReplayAdapter(fixture_dir=config['fixtures'], latency=config['latency'], jitter=config['jitter'],
+                            calls_per_minute=config['calls_per_minute'])
+    with installed(adapter):
+        start = time.perf_counter()
+        importlib.import_module('main')
+        results = {'startup': time.perf_counter() - start}
+        # the symbol index is built before the measurement, so the search finds the tickers
+        # and its download does not use up the quota of the measured pages
+        symbols = importlib.import_module('services.symbols')
+        symbols.SymbolIndex.from_listing(fixtures.listing()).save()
+        scenario = single_session if config['scenario'] == 'single' else many_sessions
+        results.update(scenario(config, adapter))
+    return results
+
+
+def run(config: dict, repeat: int = 3) -> dict:
+    # run both scenarios `repeat` times, each in its own process with its own empty cache directory
+    samples = {}
+    upstream = {}
+    for _ in range(repeat):
+        for scenario in ('single', 'many'):
+            with tempfile.TemporaryDirectory() as directory:
+                env = dict(os.environ,
+                           STOCK_ANALYSIS_CACHE_DIR=os.path.join(directory, 'cache'),
+                           STOCK_ANALYSIS_PANEL_DIR=os.path.join(directory, 'panels'),
+                           STOCK_ANALYSIS_SUMMARY_BACKEND='extractive',
+                           # without a quota the app's own limiter is practically off, like the replay's
+                           ALPHA_VANTAGE_CALLS_PER_MINUTE=str(config['calls_per_minute'] or 10 ** 6))
+                process = subprocess.run([sys.executable, '-m', 'benchmarks.e2e', '--child',
+                                          json.dumps(dict(config, scenario=scenario))],
+                                         cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+            for name, value in json.loads(process.stdout.splitlines()[-1]).items():
+                if name.endswith('upstream'):
+                    upstream[name] = value
+                elif isinstance(value, dict):
+                    samples.setdefault(f'{name}.wall', []).append(value['wall_ms'] / 1000)
+                    samples.setdefault(f'{name}.page_median', []).append(value['pages']['median_ms'] / 1000)
+                else:
+                    samples.setdefault(name, []).append(value)
+    results = {name: summarize(seconds) for name, seconds in samples.items()}
+    results['upstream'] = upstream
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run one end-to-end measurement (used by python -m benchmarks).')
+    parser.add_argument('--child', required=True, help='the configuration of the measurement as JSON')
+    args = parser.parse_args()
+    print(json.dumps(child(json.loads(args.child))))
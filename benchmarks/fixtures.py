@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+# the line items Alpha Vantage reports in each annual statement, in the order of its responses
+# read the docs https://www.alphavantage.co/documentation/#fundamentals
+INCOME_ITEMS = ['grossProfit', 'totalRevenue', 'costOfRevenue', 'costofGoodsAndServicesSold', 'operatingIncome',
+                'sellingGeneralAndAdministrative', 'researchAndDevelopment', 'operatingExpenses',
+                'investmentIncomeNet', 'netInterestIncome', 'interestIncome', 'interestExpense',
+                'nonInterestIncome', 'otherNonOperatingIncome', 'depreciation', 'depreciationAndAmortization',
+                'incomeBeforeTax', 'incomeTaxExpense', 'interestAndDebtExpense',
+                'netIncomeFromContinuingOperations', 'comprehensiveIncomeNetOfTax', 'ebit', 'ebitda', 'netIncome']
+BALANCE_ITEMS = ['totalAssets', 'totalCurrentAssets', 'cashAndCashEquivalentsAtCarryingValue',
+                 'cashAndShortTermInvestments', 'inventory', 'currentNetReceivables', 'totalNonCurrentAssets',
+                 'propertyPlantEquipment', 'accumulatedDepreciationAmortizationPPE', 'intangibleAssets',
+                 'intangibleAssetsExcludingGoodwill', 'goodwill', 'investments', 'longTermInvestments',
+                 'shortTermInvestments', 'otherCurrentAssets', 'otherNonCurrentAssets', 'totalLiabilities',
+                 'totalCurrentLiabilities', 'currentAccountsPayable', 'deferredRevenue', 'currentDebt',
+                 'shortTermDebt', 'totalNonCurrentLiabilities', 'capitalLeaseObligations', 'longTermDebt',
+                 'currentLongTermDebt', 'longTermDebtNoncurrent', 'shortLongTermDebtTotal',
+                 'otherCurrentLiabilities', 'otherNonCurrentLiabilities', 'totalShareholderEquity', 'treasuryStock',
+                 'retainedEarnings', 'commonStock', 'commonStockSharesOutstanding']
+CASH_FLOW_ITEMS = ['operatingCashflow', 'paymentsForOperatingActivities', 'proceedsFromOperatingActivities',
+                   'changeInOperatingLiabilities', 'changeInOperatingAssets', 'depreciationDepletionAndAmortization',
+                   'capitalExpenditures', 'changeInReceivables', 'changeInInventory', 'profitLoss',
+                   'cashflowFromInvestment', 'cashflowFromFinancing', 'proceedsFromRepaymentsOfShortTermDebt',
+                   'paymentsForRepurchaseOfCommonStock', 'paymentsForRepurchaseOfEquity',
+                   'paymentsForRepurchaseOfPreferredStock', 'dividendPayout', 'dividendPayoutCommonStock',
+                   'dividendPayoutPreferredStock', 'proceedsFromIssuanceOfCommonStock',
+                   'proceedsFromIssuanceOfLongTermDebtAndCapitalSecuritiesNet',
+                   'proceedsFromIssuanceOfPreferredStock', 'proceedsFromRepurchaseOfEquity',
+                   'proceedsFromSaleOfTreasuryStock', 'changeInCashAndCashEquivalents', 'changeInExchangeRate',
+                   'netIncome']
+STATEMENT_ITEMS = {'INCOME_STATEMENT': INCOME_ITEMS,
+                   'BALANCE_SHEET': BALANCE_ITEMS,
+                   'CASH_FLOW': CASH_FLOW_ITEMS}
+# Alpha Vantage returns about five fiscal years of annual reports
+DEFAULT_YEARS = 5
+# the number of bars of the generated weekly and full daily price series, about twenty years
+DEFAULT_BARS = 1000
+DEFAULT_DAILY_BARS = 5000
+SECTORS = ['Information Technology', 'Health Care', 'Financials', 'Consumer Discretionary', 'Communication Services',
+           'Industrials', 'Consumer Staples', 'Energy', 'Utilities', 'Real Estate', 'Materials']
+# the note Alpha Vantage sends instead of data when the quota is used up
+THROTTLE_NOTE = {'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute '
+                         'and 500 calls per day. Please visit https://www.alphavantage.co/premium/ if you would like '
+                         'to target a higher API call frequency.'}
+
+
+def random_state(*parts) -> np.random.Generator:
+    # the same ticker always gets the same numbers, so runs of different commits compare the same data
+    seed = int.from_bytes(hashlib.sha1(repr(parts).encode()).digest()[:8], 'little')
+    return np.random.default_rng(seed)
+
+
+def statement(function: str, symbol: str, years: int = DEFAULT_YEARS) -> dict:
+    # an annual statement response with `years` fiscal years, values are strings and a few are 'None' like upstream
+    rng = random_state(function, symbol, years)
+    items = STATEMENT_ITEMS[function]
+    values = rng.integers(10 ** 6, 10 ** 11, size=(years, len(items)))
+    missing = rng.random(size=values.shape) < 0.05
+    reports = []
+    for year in range(years):
+        report = {'fiscalDateEnding': f'{2022 - year}-09-30', 'reportedCurrency': 'USD'}
+        for item, value, none in zip(items, values[year], missing[year]):
+            report[item] = 'None' if none else str(value)
+        reports.append(report)
+    return {'symbol': symbol, 'annualReports': reports, 'quarterlyReports': []}
+
+
+def overview(symbol: str) -> dict:
+    rng = random_state('OVERVIEW', symbol)
+    return {'Symbol': symbol,
+            'AssetType': 'Common Stock',
+            'Name': f'{symbol} Inc',
+            'Description': f'{symbol} Inc is a company used to benchmark the app. ' * 20,
+            'Exchange': 'NASDAQ',
+            'Currency': 'USD',
+            'Country': 'USA',
+            'Sector': 'TECHNOLOGY',
+            'Industry': 'ELECTRONIC COMPUTERS',
+            'FiscalYearEnd': 'September',
+            'LatestQuarter': '2023-06-30',
+            'MarketCapitalization': str(int(rng.integers(10 ** 9, 10 ** 12)))}
+
+
+def time_series(function: str, symbol: str, bars: int = DEFAULT_BARS) -> dict:
+    # an adjusted weekly or daily series of `bars` bars, newest first like upstream
+    rng = random_state(function, symbol, bars)
+    weekly = function == 'TIME_SERIES_WEEKLY_ADJUSTED'
+    dates = pd.bdate_range(end='2023-06-30', periods=bars)
+    if weekly:
+        dates = pd.date_range(end='2023-06-30', periods=bars, freq='W-FRI')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=bars)))
+    series = {}
+    for date, price in zip(dates[::-1], close[::-1]):
+        series[str(date.date())] = {'1. open': f'{price:.4f}', '2. high': f'{price * 1.01:.4f}',
+                                    '3. low': f'{price * 0.99:.4f}', '4. close': f'{price:.4f}',
+                                    '5. adjusted close': f'{price:.4f}', '6. volume': '1000000',
+                                    '7. dividend amount': '0.0000', '8. split coefficient': '1.0'}
+    key = 'Weekly Adjusted Time Series' if weekly else 'Time Series (Daily)'
+    return {'Meta Data': {'1. Information': function, '2. Symbol': symbol, '3. Last Refreshed': '2023-06-30'},
+            key: series}
+
+
+def sector() -> dict:
+    rng = random_state('SECTOR')
+    ranks = ['Rank A: Real-Time Performance', 'Rank B: 1 Day Performance', 'Rank C: 5 Day Performance',
+             'Rank D: 1 Month Performance', 'Rank E: 3 Month Performance', 'Rank F: Year-to-Date (YTD) Performance',
+             'Rank G: 1 Year Performance', 'Rank H: 3 Year Performance', 'Rank I: 5 Year Performance',
+             'Rank J: 10 Year Performance']
+    response = {'Meta Data': {'Information': 'US Sector Performance (realtime & historical)'}}
+    for rank in ranks:
+        response[rank] = {name: f'{value:.2f}%' for name, value in zip(SECTORS, rng.normal(0, 5, len(SECTORS)))}
+    return response
+
+
+def listing(symbols: int = 8000) -> str:
+    # the CSV of LISTING_STATUS with made up symbols next to the ones the app offers by default
+    rng = random_state('LISTING_STATUS', symbols)
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    rows = ['symbol,name,exchange,assetType,ipoDate,delistingDate,status',
+            'AAPL,Apple Inc,NASDAQ,Stock,1980-12-12,null,Active',
+            'AMZN,Amazon.com Inc,NASDAQ,Stock,1997-05-15,null,Active',
+            'META,Meta Platforms Inc - Class A,NASDAQ,Stock,2012-05-18,null,Active',
+            'NFLX,Netflix Inc,NASDAQ,Stock,2002-05-23,null,Active']
+    for number in range(symbols):
+        symbol = ''.join(rng.choice(letters, size=rng.integers(1, 6)))
+        rows.append(f'{symbol},{symbol.title()} Holdings {number} Corp,NYSE,Stock,2000-01-03,null,Active')
+    return '\n'.join(rows) + '\n'
+
+
+def news(symbol: str, articles: int = 8) -> dict:
+    # the search response yfinance reads the news from
+    return {'news': [{'uuid': f'{symbol}-{number}',
+                      'title': f'{symbol} news story {number}',
+                      'publisher': 'Benchmark Wire',
+                      'link': f'https://finance.yahoo.com/news/{symbol.lower()}-story-{number}.html',
+                      'providerPublishTime': 1688083200 - number * 3600,
+                      'type': 'STORY'}
+                     for number in range(articles)]}
+
+
+def article(url: str, paragraphs: int = 12) -> str:
+    # a news page with the article text inside the element the app extracts, and some page around it
+    rng = random_state('ARTICLE', url)
+    words = np.array(['revenue', 'growth', 'quarter', 'shares', 'market', 'analysts', 'guidance', 'margin',
+                      'investors', 'earnings', 'the', 'a', 'of', 'and', 'in', 'to'])
+    body = ''.join(f"<p>{' '.join(rng.choice(words, size=40)).capitalize()}.</p>" for _ in range(paragraphs))
+    page_chrome = '<nav>' + '<a href="#">link</a>' * 200 + '</nav>'
+    return (f'<html><head><title>{url}</title></head><body>{page_chrome}'
+            f'<div class="caas-body">{body}</div>{page_chrome}</body></html>')
+
+
+def recorded(fixture_dir: Optional[str], name: str) -> Optional[bytes]:
+    # the body of a recorded response, or None if nothing was recorded under that name
+    if fixture_dir is None:
+        return None
+    try:
+        with open(os.path.join(fixture_dir, name), 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def record(fixture_dir: str, name: str, content: bytes):
+    os.makedirs(os.path.dirname(os.path.join(fixture_dir, name)), exist_ok=True)
+    with open(os.path.join(fixture_dir, name), 'wb') as file:
+        file.write(content)
+
+
+def to_json(value) -> bytes:
+    return json.dumps(value).encode()
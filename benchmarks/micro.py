@@ -0,0 +1,67 @@
+import importlib
+from typing import Dict, Iterable
+
+from alpha_vantage.fundamentaldata import FundamentalData
+from alpha_vantage.timeseries import TimeSeries
+from streamlit.elements.arrow import marshall
+from streamlit.proto.Arrow_pb2 import Arrow
+
+from services.downsample import downsample
+from services.styling import render_once, styled_table
+
+from .replay import ReplayAdapter, installed
+from .timing import measure
+
+
+# the statement widths (fiscal years) and price series lengths (bars) the hot paths are measured at
+STATEMENT_WIDTHS = (5, 20, 40)
+SERIES_LENGTHS = (1000, 5000, 20000)
+# the chart widths in pixels the price series are downsampled to
+CHART_WIDTHS = (350, 700, 1400)
+# what the statement tabs chart by default
+CHART_ITEMS = ['totalRevenue', 'grossProfit', 'netIncome']
+
+
+def render(styler) -> Arrow:
+    # turn a styled table into the message st.dataframe sends to the browser, which is where a Styler is rendered
+    proto = Arrow()
+    marshall(proto, styler, 'benchmark')
+    return proto
+
+
+def statement_benchmarks(widths: Iterable[int] = STATEMENT_WIDTHS, repeat: int = 20) -> Dict[str, dict]:
+    # standardize_data, make_pretty and the statement chart at several statement widths
+    main = importlib.import_module('main')
+    results = {}
+    for years in widths:
+        with installed(ReplayAdapter(years=years)):
+            raw = FundamentalData(key='replay').get_income_statement_annual(symbol=f'W{years}')[0]
+        frame = main.standardize_data(raw).frame
+        results[f'standardize_data[{years}y]'] = measure(lambda: main.standardize_data(raw), repeat)
+        # a table that was not styled yet, and a rerun that finds it in the render cache
+        results[f'make_pretty_cold[{years}y]'] = measure(lambda: render(render_once(frame.style.pipe(main.make_pretty))),
+                                                         repeat)
+        results[f'make_pretty_cached[{years}y]'] = measure(lambda: render(styled_table(frame, main.make_pretty)),
+                                                           repeat)
+        chart = frame.transpose()
+        results[f'statement_chart[{years}y]'] = measure(lambda: downsample(chart, CHART_ITEMS), repeat)
+    return results
+
+
+def chart_benchmarks(lengths: Iterable[int] = SERIES_LENGTHS, widths: Iterable[int] = CHART_WIDTHS,
+                     repeat: int = 20) -> Dict[str, dict]:
+    # the downsampling of the price chart for series of several lengths and charts of several widths
+    results = {}
+    for bars in lengths:
+        with installed(ReplayAdapter(daily_bars=bars)):
+            prices = TimeSeries(key='replay', output_format='pandas').get_daily_adjusted(f'B{bars}',
+                                                                                        outputsize='full')[0]
+        prices = prices.rename(columns={'5. adjusted close': 'adjusted close'}).sort_index()
+        for width in widths:
+            results[f'price_chart[{bars}bars,{width}px]'] = measure(
+                lambda: downsample(prices, ['adjusted close'], max_points=width), repeat)
+    return results
+
+
+def run(repeat: int = 20) -> Dict[str, dict]:
+    return {**statement_benchmarks(repeat=repeat), **chart_benchmarks(repeat=repeat)}
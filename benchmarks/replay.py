@@ -0,0 +1,149 @@
+import collections
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from . import fixtures
+
+
+class ReplayAdapter(BaseAdapter):
+    # a requests transport that answers the Alpha Vantage, Yahoo Finance search and news article requests of the app
+    # from recorded fixtures (or generated ones when nothing was recorded), after a configurable latency
+    # and with Alpha Vantage's throttle note once the configured quota per minute is used up
+    # read the docs https://requests.readthedocs.io/en/latest/user/advanced/#transport-adapters
+    #
+    # with record=True the requests go to the real services and the responses are saved as fixtures,
+    # so a later run can replay them without API keys
+
+    def __init__(self, fixture_dir: Optional[str] = None, latency: float = 0.0, jitter: float = 0.0,
+                 calls_per_minute: Optional[float] = None, years: int = fixtures.DEFAULT_YEARS,
+                 bars: int = fixtures.DEFAULT_BARS, daily_bars: int = fixtures.DEFAULT_DAILY_BARS,
+                 record: bool = False):
+        super().__init__()
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.calls_per_minute = calls_per_minute
+        self.years = years
+        self.bars = bars
+        self.daily_bars = daily_bars
+        self.live = HTTPAdapter() if record else None
+        # the number of requests and bytes served per endpoint, and the number of throttled requests
+        self.calls = collections.Counter()
+        self.bytes = collections.Counter()
+        self.throttled = 0
+        self._recent = collections.deque()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.bytes.clear()
+            self.throttled = 0
+            self._recent.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'calls': dict(self.calls), 'bytes': dict(self.bytes), 'throttled': self.throttled}
+
+    def route(self, url: str) -> Tuple[str, str, Callable[[], bytes]]:
+        # return the endpoint, the fixture name and a function that generates the response of a url
+        parts = urlsplit(url)
+        params = dict(parse_qsl(parts.query))
+        if parts.netloc == 'www.alphavantage.co':
+            function = params.get('function', '')
+            symbol = params.get('symbol', '')
+            if function == 'LISTING_STATUS':
+                return function, 'alphavantage/LISTING_STATUS.csv', lambda: fixtures.listing().encode()
+            if function in fixtures.STATEMENT_ITEMS:
+                generate = lambda: fixtures.to_json(fixtures.statement(function, symbol, self.years))
+            elif function == 'OVERVIEW':
+                generate = lambda: fixtures.to_json(fixtures.overview(symbol))
+            elif function == 'TIME_SERIES_WEEKLY_ADJUSTED':
+                generate = lambda: fixtures.to_json(fixtures.time_series(function, symbol, self.bars))
+            elif function == 'TIME_SERIES_DAILY_ADJUSTED':
+                # a compact daily series has the latest 100 bars
+                bars = 100 if params.get('outputsize', 'compact') == 'compact' else self.daily_bars
+                function = f"{function}-{params.get('outputsize', 'compact')}"
+                generate = lambda: fixtures.to_json(fixtures.time_series('TIME_SERIES_DAILY_ADJUSTED', symbol, bars))
+            elif function == 'SECTOR':
+                generate = lambda: fixtures.to_json(fixtures.sector())
+            else:
+                generate = lambda: fixtures.to_json({'Error Message': f'Invalid API call: {function}'})
+            return function, f'alphavantage/{function}-{symbol}.json', generate
+        if parts.netloc.endswith('finance.yahoo.com') and parts.path.endswith('/finance/search'):
+            symbol = params.get('q', '')
+            return 'news', f'yahoo/search-{symbol}.json', lambda: fixtures.to_json(fixtures.news(symbol))
+        name = hashlib.sha1(url.encode()).hexdigest()
+        return 'article', f'articles/{name}.html', lambda: fixtures.article(url).encode()
+
+    def _throttle(self, endpoint: str) -> bool:
+        # whether an Alpha Vantage request goes over the quota of the last minute
+        if self.calls_per_minute is None or endpoint in ('news', 'article'):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.calls_per_minute:
+                self.throttled += 1
+                return True
+            self._recent.append(now)
+            return False
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        endpoint, name, generate = self.route(request.url)
+        if self.live is not None:
+            response = self.live.send(request, **kwargs)
+            if response.ok:
+                fixtures.record(self.fixture_dir, name, response.content)
+            return response
+
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if self._throttle(endpoint):
+            return self.respond(request, 200, fixtures.to_json(fixtures.THROTTLE_NOTE))
+        content = fixtures.recorded(self.fixture_dir, name) or generate()
+        with self._lock:
+            self.calls[endpoint] += 1
+            self.bytes[endpoint] += len(content)
+        # articles carry a validator like real news sites, so the conditional requests of the app can be measured
+        etag = '"%s"' % hashlib.sha1(content).hexdigest()
+        if request.headers.get('If-None-Match') == etag:
+            return self.respond(request, 304, b'', {'ETag': etag})
+        return self.respond(request, 200, content, {'ETag': etag})
+
+    def respond(self, request: requests.PreparedRequest, status: int, content: bytes,
+                headers: Optional[dict] = None) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response._content = content
+        response.headers = CaseInsensitiveDict(headers or {})
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        if self.live is not None:
+            self.live.close()
+
+
+@contextmanager
+def installed(adapter: ReplayAdapter):
+    # send every request of every requests session (including the module level requests.get the alpha_vantage
+    # and yfinance libraries use) through the adapter while the block runs
+    get_adapter = requests.Session.get_adapter
+    requests.Session.get_adapter = lambda session, url: adapter
+    try:
+        yield adapter
+    finally:
+        requests.Session.get_adapter = get_adapter
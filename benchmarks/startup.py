@@ -0,0 +1,74 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+from .e2e import ROOT
+from .timing import summarize
+
+
+# the libraries the app must not import at startup, each one is loaded when the first tab or fetch needs it,
+# a result that shows one of them loaded fails the comparison no matter how fast the import was
+DEFERRED_MODULES = ['alpha_vantage', 'bs4', 'lxml', 'openai', 'seaborn', 'yaml', 'yfinance']
+# the packages main imports whose import time is reported on its own, the rest of `import main` is the app's own
+# startup (its modules, the libraries they import and the code that runs at import time)
+FRAMEWORK_MODULES = ['numpy', 'pandas', 'streamlit']
+# a line of python -X importtime, read the docs https://docs.python.org/3/using/cmdline.html#cmdoption-X
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$')
+
+
+def import_times(stderr: str, module: str = 'main') -> Dict[str, float]:
+    # the cumulative import time in ms of a module and of each module it imported itself (its direct children),
+    # a module imported earlier by another one is not imported again and does not show up
+    lines = [(len(match.group(3)) // 2, match.group(4), int(match.group(2)) / 1000)
+             for match in map(IMPORT_TIME.match, stderr.splitlines()) if match]
+    position = max(number for number, (_, name, _) in enumerate(lines) if name == module)
+    depth = lines[position][0]
+    times = {module: lines[position][2]}
+    # the children are printed before their parent, down to the previous module of the same depth
+    for child_depth, name, milliseconds in reversed(lines[:position]):
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 1:
+            times[name] = milliseconds
+    return times
+
+
+def import_main() -> dict:
+    # import the app in a fresh interpreter and return the import times and the modules it loaded
+    script = 'import json, sys; import main; print(json.dumps(sorted(sys.modules)))'
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, STOCK_ANALYSIS_CACHE_DIR=os.path.join(directory, 'cache'),
+                   STOCK_ANALYSIS_PANEL_DIR=os.path.join(directory, 'panels'))
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], cwd=ROOT, env=env,
+                                 capture_output=True, text=True, check=True)
+    return {'times': import_times(process.stderr), 'modules': json.loads(process.stdout.splitlines()[-1])}
+
+
+def loaded_deferred(modules: List[str]) -> List[str]:
+    # the deferred libraries (or any of their submodules) among the loaded modules
+    return sorted({name for name in DEFERRED_MODULES
+                   if any(module == name or module.startswith(name + '.') for module in modules)})
+
+
+def run(repeat: int = 5) -> dict:
+    # the time of `import main` in fresh processes, split into the frameworks and the app's own imports
+    samples = {'import[main]': [], 'import[app]': []}
+    samples.update({f'import[{name}]': [] for name in FRAMEWORK_MODULES})
+    deferred = set()
+    for _ in range(repeat):
+        result = import_main()
+        times = result['times']
+        total = times.get('main', 0.0)
+        frameworks = {name: times.get(name, 0.0) for name in FRAMEWORK_MODULES}
+        samples['import[main]'].append(total / 1000)
+        samples['import[app]'].append(max(total - sum(frameworks.values()), 0.0) / 1000)
+        for name, milliseconds in frameworks.items():
+            samples[f'import[{name}]'].append(milliseconds / 1000)
+        deferred.update(loaded_deferred(result['modules']))
+    results = {name: summarize(seconds) for name, seconds in samples.items()}
+    results['loaded_deferred'] = sorted(deferred)
+    return results
@@ -0,0 +1,26 @@
+import statistics
+import time
+from typing import Callable, List
+
+
+def summarize(seconds: List[float]) -> dict:
+    # the statistics of a list of timings in milliseconds, the median is the number to compare between commits
+    milliseconds = sorted(value * 1000 for value in seconds)
+    return {'runs': len(milliseconds),
+            'min_ms': round(milliseconds[0], 4),
+            'median_ms': round(statistics.median(milliseconds), 4),
+            'mean_ms': round(statistics.fmean(milliseconds), 4),
+            'p95_ms': round(milliseconds[min(len(milliseconds) - 1, int(0.95 * len(milliseconds)))], 4),
+            'max_ms': round(milliseconds[-1], 4)}
+
+
+def measure(func: Callable[[], object], repeat: int = 20, warmup: int = 1) -> dict:
+    # time repeated calls of a function after a few untimed calls
+    for _ in range(warmup):
+        func()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+    return summarize(seconds)
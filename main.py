@@ -4,114 +4,310 @@ May 2023
 
 """
 # importing libraries
+import numpy as np
 import pandas as pd
-import yaml
+import hmac
+import time
 import streamlit as st
-from alpha_vantage.fundamentaldata import FundamentalData
-from alpha_vantage.techindicators import TechIndicators
-from alpha_vantage.sectorperformance import SectorPerformances
 import requests
-import seaborn as sns
-from tabs import (company_info,
-                  company_price_chart,
-                  company_balance_sheet,
-                  company_income_statement,
-                  company_cash_flow,
-                  company_news)
-
-
-# Initialize FundamentalData, SectorPerformances, and TechIndicators objects using your Alpha Vantage API key
-fd = FundamentalData(key=st.secrets['alpha_vantage']) #find more info in https://www.alphavantage.co/documentation/
-sp = SectorPerformances(key=st.secrets['alpha_vantage'])
-ti = TechIndicators(key=st.secrets['alpha_vantage'])
+# the tab modules are loaded when a tab is first shown, read tabs/__init__.py
+import tabs
+from services import (TTL,
+                     background_gradient,
+                     cache_miss,
+                     fetch_bundle,
+                     freshness,
+                     get_client,
+                     get_gateway,
+                     gradient_palette,
+                     memory_ttl,
+                     parse_statement,
+                     persistent,
+                     prefetch,
+                     register_client,
+                     timed)
+from services.metrics import start_exporter
+from services.news import PREFETCH_ARTICLES, news_items, prefetch_articles
+from services.panel import load_companies, load_panel, panel_statement
+from services.symbols import get_symbol_index, refresh_symbol_index
+from services.summarizer import SUMMARY_BACKEND
+from services.warmer import start_warmer
+
+
+def fundamental_data():
+    # Function to create the FundamentalData client with your Alpha Vantage API key
+    # the alpha_vantage library is imported here, so it is only loaded once the first statement is fetched
+    from alpha_vantage.fundamentaldata import FundamentalData
+    return FundamentalData(key=st.secrets['alpha_vantage']) #find more info in https://www.alphavantage.co/documentation/
+
+
+def sector_performances():
+    # Function to create the SectorPerformances client with your Alpha Vantage API key
+    from alpha_vantage.sectorperformance import SectorPerformances
+    return SectorPerformances(key=st.secrets['alpha_vantage'])
+
+
+def tech_indicators():
+    # Function to create the TechIndicators client with your Alpha Vantage API key
+    from alpha_vantage.techindicators import TechIndicators
+    return TechIndicators(key=st.secrets['alpha_vantage'])
+
+
+# Register the FundamentalData, SectorPerformances, and TechIndicators clients,
+# each one is created on its first call and then shared by every session of the process,
+# every client goes through the process-wide gateway, which shares identical in-flight requests between sessions,
+# keeps the calls within the plan's quota and refuses to return throttle notes as data
+register_client('fd', fundamental_data)
+register_client('sp', sector_performances)
+register_client('ti', tech_indicators)
+
+
+# the css of every color of the light seagreen palette, computed once per process,
+# so styling a table only has to look the colors up
+gradient = gradient_palette()
+
+
+@timed('listing_status')
+def listing_status():
+    # Function to download the listing of all active symbols on Alpha Vantage as CSV text
+    # read the docs https://www.alphavantage.co/documentation/#listing-status
+    response = requests.get(url='https://www.alphavantage.co/query',
+                            params={'function': 'LISTING_STATUS',
+                                    'apikey': st.secrets['alpha_vantage']},
+                            timeout=60)
+    # a throttle note comes as JSON instead of CSV, return it as a dict so the gateway recognizes it
+    if response.text.lstrip().startswith('{'):
+        return response.json()
+    return response.text
 
 
-# Set up a seaborn color palette
-# read the docs https://seaborn.pydata.org/generated/seaborn.light_palette.html
-cm = sns.light_palette("seagreen", as_cmap=True)
+def download_listing():
+    # Function to download the listing through the gateway, it counts against the API quota like any other call
+    return get_gateway().call(('listing_status',), listing_status)
 
 
+@timed('find_match')
 def find_match(ticker: str = 'AAPL'):
-    # Function to search for a given ticker on Alpha Vantage
-    response = requests.get(url='https://www.alphavantage.co/query',
-                                  params={'function': 'SYMBOL_SEARCH',
-                                          'keywords': ticker,
-                                          'datatype': 'json',
-                                          'apikey': st.secrets['alpha_vantage']}
-                 )
-    # Return the JSON response
-    return response.json()
-
-
-# Use Streamlit's cache decorator to store the result of this function, so it only runs once
-@st.cache_data # read more at https://docs.streamlit.io/en/stable/caching.html
+    # Function to search for a given ticker or company name in the local symbol index, it does not use the API
+    return get_symbol_index().search(ticker)
+
+
+# Use Streamlit's cache decorator to store the result of this function, so it only runs once per ttl
+# read more at https://docs.streamlit.io/en/stable/caching.html
+# the persistent decorator keeps a copy on disk, so restarts and other workers do not go back to the API
+# the timed decorator records how long every call takes and whether Streamlit's cache had the result,
+# the cache_miss decorator below the cache tells it when the function body had to run
+# the in-memory cache only keeps a result for an hour, so a refresh of the disk cache by the cache warmer shows up,
+# the functions below it (overview_data, income_statement_data, ...) are the ones the cache warmer calls
+@timed('company_overview', cache='memory')
+@st.cache_data(ttl=memory_ttl('overview'))
+@cache_miss
 def company_overview(ticker: str):
     # This function gets the company overview for a given ticker
-    return fd.get_company_overview(symbol=ticker)
+    return overview_data(ticker)
+
+
+@persistent('overview', name='company_overview')
+def overview_data(ticker: str):
+    # This function gets the company overview for a given ticker from the persistent cache or Alpha Vantage
+    return get_client('fd').get_company_overview(symbol=ticker)
 
 
-@st.cache_data
+@timed('sector_data', cache='memory')
+@st.cache_data(ttl=memory_ttl('sector'))
+@cache_miss
+@persistent('sector')
 def sector_data():
     # This function gets sector performance data
-    data = sp.get_sector()
+    data = get_client('sp').get_sector()
     return data
 
 
-@st.cache_data
+@timed('statement_panel', cache='memory')
+@st.cache_resource(ttl=TTL['overview'])
+@cache_miss
+def statement_panel():
+    # This function loads the statements panel written by screener.py, it returns None if there is no panel yet
+    return load_panel()
+
+
+@timed('peer_cross_section', cache='memory')
+@st.cache_resource(ttl=TTL['overview'])
+@cache_miss
+def peer_cross_section():
+    # This function loads the cross-section of the screened companies as a (tickers x metrics x years) array,
+    # it returns None if screener.py has not written one yet
+    # the peers module is imported here, so it is only loaded once the Peers tab is first shown
+    from services.peers import load_cross_section, to_cube
+    cross_section = load_cross_section()
+    return None if cross_section is None else to_cube(cross_section)
+
+
+@timed('company_panel', cache='memory')
+@st.cache_resource(ttl=TTL['overview'])
+@cache_miss
+def company_panel():
+    # This function loads the name, sector and industry of the screened companies, or None if there are none yet
+    return load_companies()
+
+
+def sector_performance():
+    # This function gets the performance of every sector, the Peers tab is shown without it if it can not be loaded
+    try:
+        return sector_data()[0]
+    except Exception:
+        return None
+
+
+def panel_copy(raw, ticker: str, name: str):
+    # This function returns a statement of the screener's panel, unless the persistent cache has a raw statement of
+    # the ticker that was fetched after it (by the app or the warmer) or the panel's copy is older than the statements'
+    # ttl, or than a max_age block allows (the warmer's refreshes), then None is returned and the raw one is used
+    ttl, _ = freshness(TTL['statement'])
+    newer_than = max(time.time() - ttl.total_seconds(), raw.cached_at(ticker) or 0)
+    return panel_statement(statement_panel(), ticker, name, newer_than=newer_than)
+
+
+@timed('income_statement_raw')
+@persistent('statement')
+def income_statement_raw(ticker: str):
+    # This function gets the raw annual income statement for a given ticker
+    return get_client('fd').get_income_statement_annual(symbol=ticker)[0] # read the docs https://www.alphavantage.co/documentation/
+
+
+@timed('get_income_statement', cache='memory')
+@st.cache_data(ttl=memory_ttl('statement'))
+@cache_miss
 def get_income_statement(ticker: str):
+    # This function gets the standardized annual income statement for a given ticker
+    return income_statement_data(ticker)
+
+
+@persistent('statement', name='get_income_statement', version=2)
+def income_statement_data(ticker: str):
     # This function gets the annual income statement for a given ticker and standardizes the data
-    data = fd.get_income_statement_annual(symbol=ticker) # read the docs https://www.alphavantage.co/documentation/
-    data, currency = standardize_data(data[0])
-    return data, currency
+    # use the nightly panel of the screener when it has the ticker and nothing newer was fetched since
+    statement = panel_copy(income_statement_raw, ticker, 'income_statement')
+    if statement is not None:
+        return statement
+    data = income_statement_raw(ticker)
+    return standardize_data(data)
 
 
-def standardize_data(database: pd.DataFrame):
+@timed('standardize_data')
+def standardize_data(database: pd.DataFrame, dtype: type = np.float64):
     # Function to standardize a DataFrame returned by Alpha Vantage
-    # transpose the data
-    data = database.transpose() # read the docs https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.transpose.html
-    # set the first row as the column names
-    data.columns = data.iloc[0] # read the docs https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.columns.html
-    # get the reported currency
-    currency = data.iloc[1,1] # read the docs https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.iloc.html
-    # drop the first two rows
-    data.drop(data.index[0:1], inplace=True) # read the docs https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.drop.html
-    # drop the 'reportedCurrency' column
-    data.drop(['reportedCurrency'], inplace=True)
-    # replace 'None' values with 0
-    data.replace(to_replace="None", value=0, inplace=True) # read the docs https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.replace.html
-    # convert all data to numeric
-    data = data.apply(pd.to_numeric) # read the docs https://pandas.pydata.org/docs/reference/api/pandas.to_numeric.html
-    # convert data to millions
-    data = data.apply(lambda x: x/1000000)  # read the docs https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.apply.html
-    # return the standardized data and the reported currency
-    return data ,currency
-
-
-@st.cache_data
+    # the strings are parsed straight into one contiguous array of numbers in millions (float64, or float32 to
+    # halve the memory), with the line items as rows, the fiscal dates as columns and the reported currency
+    # the balance sheet, income statement and cash flow all share the Statement object
+    return parse_statement(database, dtype=dtype)
+
+
+@timed('balance_sheet_raw')
+@persistent('statement')
+def balance_sheet_raw(ticker: str):
+    # This function gets the raw annual balance sheet for a given ticker
+    return get_client('fd').get_balance_sheet_annual(symbol=ticker)[0] # read the docs https://www.alphavantage.co/documentation/
+
+
+@timed('get_balance_sheet', cache='memory')
+@st.cache_data(ttl=memory_ttl('statement'))
+@cache_miss
 def get_balance_sheet(ticker: str):
+    # This function gets the standardized annual balance sheet for a given ticker
+    return balance_sheet_data(ticker)
+
+
+@persistent('statement', name='get_balance_sheet', version=2)
+def balance_sheet_data(ticker: str):
     # This function gets the annual balance sheet for a given ticker and standardizes the data
-    data = fd.get_balance_sheet_annual(symbol=ticker) # read the docs https://www.alphavantage.co/documentation/
-    data, currency = standardize_data(data[0])
-    return data, currency
+    # use the nightly panel of the screener when it has the ticker and nothing newer was fetched since
+    statement = panel_copy(balance_sheet_raw, ticker, 'balance_sheet')
+    if statement is not None:
+        return statement
+    data = balance_sheet_raw(ticker)
+    return standardize_data(data)
+
 
+@timed('cash_flow_raw')
+@persistent('statement')
+def cash_flow_raw(ticker: str):
+    # This function gets the raw annual cash flow statement for a given ticker
+    return get_client('fd').get_cash_flow_annual(symbol=ticker)[0] # read the docs https://www.alphavantage.co/documentation/
 
-@st.cache_data
+
+@timed('get_cash_flow', cache='memory')
+@st.cache_data(ttl=memory_ttl('statement'))
+@cache_miss
 def get_cash_flow(ticker: str):
+    # This function gets the standardized annual cash flow statement for a given ticker
+    return cash_flow_data(ticker)
+
+
+@persistent('statement', name='get_cash_flow', version=2)
+def cash_flow_data(ticker: str):
     # This function gets the annual cash flow statement for a given ticker and standardizes the data
     # get the data
-    data = fd.get_cash_flow_annual(symbol=ticker) # read the docs https://www.alphavantage.co/documentation/
-    # standardize the data
-    data, currency = standardize_data(data[0])
-    # return the standardized data and the reported currency
-    return data, currency
+    # use the nightly panel of the screener when it has the ticker and nothing newer was fetched since
+    statement = panel_copy(cash_flow_raw, ticker, 'cash_flow')
+    if statement is not None:
+        return statement
+    data = cash_flow_raw(ticker)
+    # standardize the data and return it together with the reported currency
+    return standardize_data(data)
+
+
+def statements_data(ticker: str):
+    # This function refreshes the three standardized statements of a ticker and the raw statements they are built from
+    return income_statement_data(ticker), balance_sheet_data(ticker), cash_flow_data(ticker)
+
+
+def weekly_price_data(ticker: str):
+    # This function refreshes the weekly prices of a ticker in the price store
+    return tabs.stored_weekly_prices(ticker)
+
+
+def news_data(ticker: str):
+    # This function refreshes the news of a ticker and fetches its top articles, so they are ready to be summarized
+    news = news_items(ticker)
+    for future in prefetch_articles([item['link'] for item in news[:PREFETCH_ARTICLES]]):
+        # an article that can not be fetched does not fail the news
+        future.exception()
+    return news
+
+
+def fiscal_calendar(ticker: str):
+    # This function returns the latest reported quarter and the month the fiscal year ends from the company overview
+    overview = overview_data(ticker)[0]
+    return overview.get('LatestQuarter'), overview.get('FiscalYearEnd')
+
+
+# the functions the cache warmer calls for each part of a watchlist ticker, in the order they are refreshed,
+# they read and write the disk cache below Streamlit's in-memory cache, so every process sees what they fetched
+warm_fetchers = {'overview': overview_data,
+                 'statements': statements_data,
+                 'weekly_prices': weekly_price_data,
+                 'news': news_data}
 
 
 def make_pretty(styler):
     # Function to format a DataFrame for pretty printing
-    styler.format(formatter=(lambda x: 'M$ {:,.0f}'.format(x))).background_gradient(cmap=cm) # read the docs https://pandas.pydata.org/docs/reference/api/pandas.io.formats.style.Styler.format.html
+    styler.format(formatter=(lambda x: 'M$ {:,.0f}'.format(x))).pipe(background_gradient, gradient) # read the docs https://pandas.pydata.org/docs/reference/api/pandas.io.formats.style.Styler.format.html
     return styler
 
 
+def is_admin(query_params: dict) -> bool:
+    # Function to check the token of the hidden metrics page, the page is off unless secrets.toml has an admin_token
+    token = st.secrets.get('admin_token', '')
+    given = query_params.get('admin', [''])[0]
+    return bool(token) and hmac.compare_digest(given.encode(), token.encode())
+
+
+def show_fetch_error(part: str, error: Exception):
+    # Function to tell the user that one part of the page could not be loaded
+    st.error(f'Could not load the {part}: {error}')
+
+
 # check if the script is running in the main scope
 if __name__ == '__main__':
 
@@ -119,68 +315,168 @@ if __name__ == '__main__':
     st.set_page_config(page_title='Financial Statement Analysis',
                        page_icon='📈',
                        layout='centered') # read the docs https://docs.streamlit.io/library/api-reference/utilities/st.set_page_config
-    # create a dropdown menu for selecting ticker with default options as 'AAPL', 'AMZN', 'META', 'NFLX'
+    # export the metrics of this process in the background, if a log or Prometheus file is configured
+    start_exporter()
+    # keep the tickers of the watchlist fresh in the background, if STOCK_ANALYSIS_WATCHLIST names a watchlist file
+    start_warmer(warm_fetchers, fiscal_calendar)
+
+    # show the hidden admin page with the metrics of this process instead of the app when the url ends with
+    # ?admin=<admin_token from secrets.toml>
+    # read the docs https://docs.streamlit.io/library/api-reference/utilities/st.experimental_get_query_params
+    if is_admin(st.experimental_get_query_params()):
+        tabs.admin_metrics()
+        st.stop()
+
+    # keep the local symbol index up to date, the listing is downloaded again in the background once a day
+    refresh_symbol_index(download_listing)
+
+    # create a search box for a ticker or a company name and a dropdown menu of the matching tickers,
+    # without a search (or before the first listing was downloaded) the options are 'AAPL', 'AMZN', 'META', 'NFLX'
+    # read the docs https://docs.streamlit.io/library/api-reference/widgets/st.text_input
+    query = st.text_input(label='Search Ticker', key='ticker_query', placeholder='Ticker or company name')
+    matches = find_match(query) if query else []
     st.session_state.selected_ticker = st.selectbox(label='Select Ticker',
-                                                    options=['AAPL', 'AMZN',
-                                                             'META', 'NFLX']) # read the docs https://docs.streamlit.io/library/api-reference/widgets/st.selectbox
-
-    # fetch and store the company overview details for the selected ticker
+                                                    options=[match['symbol'] for match in matches] or
+                                                            ['AAPL', 'AMZN', 'META', 'NFLX'],
+                                                    format_func=lambda symbol: next(
+                                                        (f"{symbol} - {match['name']} ({match['exchange']})"
+                                                         for match in matches if match['symbol'] == symbol),
+                                                        symbol)) # read the docs https://docs.streamlit.io/library/api-reference/widgets/st.selectbox
+
+    # the functions that fetch each part of the data of a ticker
+    fetchers = {'overview': company_overview,
+                'balance_sheet': get_balance_sheet,
+                'income_statement': get_income_statement,
+                'cash_flow': get_cash_flow,
+                'weekly_prices': tabs.weekly_prices,
+                'news': tabs.get_news}
+    # the functions below Streamlit's cache that the prefetch warms, they only write the disk cache,
+    # so opening a tab later is a disk cache hit
+    disk_fetchers = {'overview': overview_data,
+                     'balance_sheet': balance_sheet_data,
+                     'income_statement': income_statement_data,
+                     'cash_flow': cash_flow_data,
+                     'weekly_prices': tabs.stored_weekly_prices,
+                     'news': news_items}
+
+    # the parts of the data each tab needs
+    tab_parts = {'About the Company': ['overview'],
+                 'Stock Price Chart': ['weekly_prices'],
+                 'Balance Sheet': ['balance_sheet'],
+                 'Income Statement': ['income_statement'],
+                 'Statement of Cash Flow': ['cash_flow'],
+                 'Ratios': ['balance_sheet', 'income_statement', 'cash_flow'],
+                 'Peers': ['overview', 'balance_sheet', 'income_statement', 'cash_flow'],
+                 'News': ['news']}
+
+    # create a tab bar with the following tabs:
+    # 'About the Company', 'Stock Price Chart', 'Balance Sheet', 'Income Statement', 'Statement of Cash Flow',
+    # 'Ratios', 'Peers', and 'News'
+    # unlike st.tabs, which runs the code of every tab on every run, only the selected tab is run,
+    # so a visit only fetches the data of the tab that is shown
+    # read the docs https://docs.streamlit.io/library/api-reference/widgets/st.radio
+    selected_tab = st.radio(label='Section', options=list(tab_parts), horizontal=True,
+                            label_visibility='collapsed', key='selected_tab')
+
+    # fetch the parts the selected tab needs at the same time,
+    # a part that fails is recorded in bundle.errors and only blanks its own tab
+    bundle = fetch_bundle(st.session_state.selected_ticker,
+                          fetchers={part: fetchers[part] for part in tab_parts[selected_tab]})
+
+    # fetch the data of the other tabs in the background with low priority,
+    # so switching tabs is instant without delaying the tab that is shown
+    prefetch(st.session_state.selected_ticker,
+             fetchers={part: fetcher for part, fetcher in disk_fetchers.items() if part not in tab_parts[selected_tab]})
+
+    # store the company overview details for the selected ticker
     # read the docs https://docs.streamlit.io/library/api-reference/session-state
-    st.session_state.company_overview = company_overview(st.session_state.selected_ticker)
+    st.session_state.company_overview = bundle.overview
 
-    # fetch and store the balance sheet for the selected ticker and its reported currency
-    st.session_state.balance_sheet, bs_reported_currency = get_balance_sheet(st.session_state.selected_ticker)
+    # store the balance sheet for the selected ticker and its reported currency
+    if bundle.balance_sheet is not None:
+        st.session_state.balance_sheet = bundle.balance_sheet.frame
+        bs_reported_currency = bundle.balance_sheet.currency
 
-    # fetch and store the income statement for the selected ticker and its reported currency
-    st.session_state.income_statement, is_reported_currency = get_income_statement(st.session_state.selected_ticker)
+    # store the income statement for the selected ticker and its reported currency
+    if bundle.income_statement is not None:
+        st.session_state.income_statement = bundle.income_statement.frame
+        is_reported_currency = bundle.income_statement.currency
 
-    # fetch and store the cash flow for the selected ticker and its reported currency
-    st.session_state.cash_flow, cf_reported_currency = get_cash_flow(st.session_state.selected_ticker)
+    # store the cash flow for the selected ticker and its reported currency
+    if bundle.cash_flow is not None:
+        st.session_state.cash_flow = bundle.cash_flow.frame
+        cf_reported_currency = bundle.cash_flow.currency
 
-    # create a tab layout in Streamlit with the following tabs:
-    # 'About the Company', 'Stock Price Chart', 'Balance Sheet', 'Income Statement', 'Statement of Cash Flow', and 'News'
-    # each tab is assigned to a corresponding variable for future reference
-    company_info_tab, price_chart_tab, bs_tab, income_tab, cashflow_tab, news_tab = \
-        st.tabs(['About the Company', 'Stock Price Chart', 'Balance Sheet',
-                 'Income Statement', 'Statement of Cash Flow', 'News']) # read the docs https://docs.streamlit.io/library/api-reference/layout/st.tabs
-
-    # inside the 'About the Company' tab
-    with company_info_tab:
+    # show the tab the user selected
+    if selected_tab == 'About the Company':
         # display company info by calling the function company_info
         # with the first element of the company overview details stored in the session state
-        company_info(company_detail=st.session_state.company_overview[0])
+        if bundle.failed('overview'):
+            show_fetch_error('company overview', bundle.errors['overview'])
+        else:
+            tabs.company_info(company_detail=st.session_state.company_overview[0])
 
-    # inside the 'Stock Price Chart' tab
-    with price_chart_tab:
+    elif selected_tab == 'Stock Price Chart':
         # display a line chart with the weekly prices (adjusted close) of the selected company
         # by calling the function 'company_price_chart' with the selected ticker
-        company_price_chart()
+        if bundle.failed('weekly_prices'):
+            show_fetch_error('weekly prices', bundle.errors['weekly_prices'])
+        else:
+            tabs.company_price_chart()
 
-    # inside the 'Balance Sheet' tab
-    with bs_tab:
+    elif selected_tab == 'Balance Sheet':
         # display the balance sheet by
         # calling the 'company_balance_sheet' function with 'make_pretty' as the formatter function and
         # 'bs_reported_currency' as the reported currency
-        company_balance_sheet(formatter=make_pretty, currency=bs_reported_currency)
+        if bundle.failed('balance_sheet'):
+            show_fetch_error('balance sheet', bundle.errors['balance_sheet'])
+        else:
+            tabs.company_balance_sheet(formatter=make_pretty, currency=bs_reported_currency)
 
-    # inside the 'Income Statement' tab
-    with income_tab:
+    elif selected_tab == 'Income Statement':
         # display the income statement by
         # calling the 'company_income_statement' function with 'make_pretty' as the formatter function and
         # 'is_reported_currency' as the reported currency
-        company_income_statement(formatter=make_pretty, currency=is_reported_currency)
+        if bundle.failed('income_statement'):
+            show_fetch_error('income statement', bundle.errors['income_statement'])
+        else:
+            tabs.company_income_statement(formatter=make_pretty, currency=is_reported_currency)
 
-    # inside the 'Statement of Cash Flow' tab
-    with cashflow_tab:
+    elif selected_tab == 'Statement of Cash Flow':
         # display the cash flow by
         # calling the 'company_cash_flow' function with 'make_pretty' as the formatter function and
         # 'cf_reported_currency' as the reported currency
-        company_cash_flow(formatter=make_pretty, currency=cf_reported_currency)
+        if bundle.failed('cash_flow'):
+            show_fetch_error('cash flow statement', bundle.errors['cash_flow'])
+        else:
+            tabs.company_cash_flow(formatter=make_pretty, currency=cf_reported_currency)
 
-    with news_tab:
+    elif selected_tab == 'Ratios':
+        # display the financial ratios and their growth, computed from all three statements
+        failed = [part for part in ['balance_sheet', 'income_statement', 'cash_flow'] if bundle.failed(part)]
+        if failed:
+            show_fetch_error('statements needed for the ratios', bundle.errors[failed[0]])
+        else:
+            tabs.company_ratios()
+
+    elif selected_tab == 'Peers':
+        # display the ratios and line items of the company next to the companies of its industry (or sector),
+        # the peers are read from the panels of screener.py
+        failed = [part for part in tab_parts['Peers'] if bundle.failed(part)]
+        if failed:
+            show_fetch_error('data needed for the peer comparison', bundle.errors[failed[0]])
+        else:
+            tabs.company_peers(company_detail=st.session_state.company_overview[0],
+                               cross_section=peer_cross_section(),
+                               companies=company_panel(),
+                               sector_performance=sector_performance())
+
+    elif selected_tab == 'News':
         # display the latest news about the company by calling the 'company_news' function
-        # with the first element of the company overview details stored in the session state
-        if 'openai' in st.secrets:
-            company_news(ticker=st.session_state.selected_ticker)
+        # with the selected ticker
+        if bundle.failed('news'):
+            show_fetch_error('news', bundle.errors['news'])
+        elif 'openai' in st.secrets or SUMMARY_BACKEND != 'openai':
+            tabs.company_news(ticker=st.session_state.selected_ticker)
         else:
-            st.error('Please add your OpenAI API key to the secrets.toml file.')
\ No newline at end of file
+            st.error('Please add your OpenAI API key to the secrets.toml file.')
@@ -0,0 +1,172 @@
+"""
+Headless bulk screener
+
+Runs the statement pipeline of the app over a whole list of tickers and writes the columnar panels
+that the Streamlit app loads instead of calling Alpha Vantage (the statements, the sector and industry
+of every company and the cross-section of their metrics the Peers tab compares):
+
+    python screener.py tickers.txt --workers 4
+
+The tickers file has one symbol per line. Every finished ticker is checkpointed to its own file,
+so running the same command again after an interruption only fetches the tickers that are left.
+A run that starts more than --max-age hours after the previous one (the next night) fetches every ticker again.
+"""
+# importing libraries
+import argparse
+import contextvars
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+import pandas as pd
+
+from main import balance_sheet_raw, income_statement_raw, cash_flow_raw, overview_data
+from services import ThrottledError, background, max_age
+from services.panel import COMPANIES_PANEL, PANEL_DIR, STATEMENTS_PANEL, company_row, load_panel, standardize_ticker
+from services.peers import load_cross_section, save_cross_section, update_cross_section
+from services.symbols import read_tickers
+
+
+# the raw statement fetchers, these go through the persistent cache and the rate limited gateway
+RAW_FETCHERS = {'balance_sheet': balance_sheet_raw,
+                'income_statement': income_statement_raw,
+                'cash_flow': cash_flow_raw}
+# a run that is started again within this many hours of the previous one continues it, a later one starts over
+MAX_AGE_HOURS = 12
+
+
+def fetch_raw(ticker: str, retries: int, since: float) -> tuple:
+    # fetch the raw statements and the company overview of a ticker with background priority,
+    # so users of the app are served first, cached copies from before the start of the run are fetched again
+    with background(), max_age(timedelta(seconds=max(time.time() - since, 0))):
+        for attempt in range(retries + 1):
+            try:
+                return {name: fetcher(ticker) for name, fetcher in RAW_FETCHERS.items()}, overview_data(ticker)[0]
+            except ThrottledError:
+                # the gateway has already emptied its token bucket, back off a bit more before trying again
+                if attempt == retries:
+                    raise
+                time.sleep(60 * (attempt + 1))
+
+
+def checkpoint_path(parts_dir: str, ticker: str) -> str:
+    return os.path.join(parts_dir, f'{ticker}.parquet')
+
+
+def company_checkpoint_path(parts_dir: str, ticker: str) -> str:
+    return os.path.join(parts_dir, f'{ticker}.company.parquet')
+
+
+def run_path(parts_dir: str) -> str:
+    return os.path.join(parts_dir, 'run')
+
+
+def start_run(parts_dir: str, max_age_hours: float, restart: bool) -> float:
+    # the start time of the run the checkpoints belong to, a new run starts when the last one started more than
+    # max_age_hours ago (or on restart), otherwise the last run is continued, also when it was a restart itself
+    path = run_path(parts_dir)
+    if not restart and os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age_hours * 3600:
+        return os.path.getmtime(path)
+    with open(path, 'w') as file:
+        file.write(time.strftime('%Y-%m-%d %H:%M:%S\n'))
+    return os.path.getmtime(path)
+
+
+def is_done(parts_dir: str, ticker: str, since: float = 0) -> bool:
+    # a ticker is done once both its statements and its company row are checkpointed, since the start of the run
+    paths = [checkpoint_path(parts_dir, ticker), company_checkpoint_path(parts_dir, ticker)]
+    return all(os.path.exists(path) and os.path.getmtime(path) >= since for path in paths)
+
+
+def checkpoint_ticker(ticker: str, parts_dir: str, retries: int, since: float, standardize=standardize_ticker):
+    # fetch, standardize and checkpoint one ticker, the screener standardizes in its process pool
+    raw_statements, overview = fetch_raw(ticker, retries, since)
+    rows = standardize(ticker, raw_statements, time.time())
+    # checkpoint the ticker as soon as it is done, write and rename so an interrupted write does not count
+    path = company_checkpoint_path(parts_dir, ticker)
+    company_row(ticker, overview).to_parquet(path + '.tmp')
+    os.replace(path + '.tmp', path)
+    path = checkpoint_path(parts_dir, ticker)
+    rows.to_parquet(path + '.tmp', index=False) # read the docs https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.to_parquet.html
+    os.replace(path + '.tmp', path)
+
+
+def write_panel(output: str, parts_dir: str, tickers: list, updated: list):
+    # combine the checkpoints of the listed tickers into one panel keyed by (ticker, statement, line item, fiscal date)
+    # and one companies panel keyed by ticker, then recompute the cross-section of the updated tickers,
+    # the tickers that failed in this run keep the checkpoint of an earlier one
+    done = [ticker for ticker in tickers if is_done(parts_dir, ticker)]
+    if not done:
+        print('No tickers were processed, the panel was not written')
+        return
+    panel = pd.concat([pd.read_parquet(checkpoint_path(parts_dir, ticker)) for ticker in done], ignore_index=True)
+    companies = pd.concat([pd.read_parquet(company_checkpoint_path(parts_dir, ticker)) for ticker in done])
+    # write to a temporary file first, so the app never reads a half written panel
+    path = os.path.join(output, STATEMENTS_PANEL)
+    panel.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+    companies.to_parquet(os.path.join(output, COMPANIES_PANEL + '.tmp'))
+    os.replace(os.path.join(output, COMPANIES_PANEL + '.tmp'), os.path.join(output, COMPANIES_PANEL))
+    print(f'Wrote {len(panel):,} rows for {len(done)} tickers to {path}')
+
+    # only the tickers fetched by this run are computed again, the rows of the others are kept
+    cross_section = update_cross_section(load_cross_section(output), load_panel(output), updated)
+    save_cross_section(cross_section, output)
+    print(f'Updated the cross-section of {len(updated)} tickers, it has {len(cross_section):,} rows '
+          f'for {cross_section.index.get_level_values("ticker").nunique()} tickers')
+
+
+def run(tickers: list, output: str, workers: int, fetch_workers: int, retries: int, restart: bool,
+        max_age_hours: float = MAX_AGE_HOURS):
+    parts_dir = os.path.join(output, 'parts')
+    os.makedirs(parts_dir, exist_ok=True)
+
+    # resume: tickers that were checkpointed since the start of the run are not fetched again
+    since = start_run(parts_dir, max_age_hours, restart)
+    todo = [ticker for ticker in tickers if not is_done(parts_dir, ticker, since)]
+    print(f"Run started {time.strftime('%Y-%m-%d %H:%M', time.localtime(since))}: "
+          f'{len(tickers) - len(todo)} tickers already done, {len(todo)} to go')
+
+    failed = {}
+    # the fetches are I/O bound and run in threads, standardizing is CPU bound and runs in a process pool
+    # the workers are spawned rather than forked, because forking while the fetch threads hold locks is unsafe
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as process_pool:
+
+        def standardize(*args) -> pd.DataFrame:
+            return process_pool.submit(standardize_ticker, *args).result()
+
+        futures = {fetch_pool.submit(contextvars.copy_context().run, checkpoint_ticker, ticker, parts_dir, retries, since,
+                                     standardize): ticker
+                   for ticker in todo}
+        for done, future in enumerate(as_completed(futures), start=1):
+            ticker = futures[future]
+            try:
+                future.result()
+                print(f'[{done}/{len(todo)}] {ticker}', flush=True)
+            except Exception as error:
+                failed[ticker] = error
+                print(f'[{done}/{len(todo)}] {ticker} failed: {error}', flush=True)
+
+    if failed:
+        print(f'{len(failed)} tickers failed, run the same command again to retry them')
+    write_panel(output, parts_dir, tickers, updated=[ticker for ticker in todo if ticker not in failed])
+
+
+# check if the script is running in the main scope
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch and standardize the financial statements of many tickers')
+    parser.add_argument('tickers', help='file with one ticker per line')
+    parser.add_argument('--output', default=PANEL_DIR, help='directory of the panel and its checkpoints')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes that standardize statements')
+    parser.add_argument('--fetch-workers', type=int, default=4, help='threads that fetch statements')
+    parser.add_argument('--retries', type=int, default=3, help='retries of a ticker after a throttle response')
+    parser.add_argument('--restart', action='store_true', help='start a new run even if the last one is recent')
+    parser.add_argument('--max-age', type=float, default=MAX_AGE_HOURS,
+                        help='hours within which the command continues the last run instead of starting a new one')
+    args = parser.parse_args()
+
+    run(tickers=read_tickers(args.tickers), output=args.output, workers=args.workers,
+        fetch_workers=args.fetch_workers, retries=args.retries, restart=args.restart, max_age_hours=args.max_age)
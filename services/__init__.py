@@ -0,0 +1,40 @@
+# Define a list of public objects that will be imported when a client imports this package
+# using the "from module import *" syntax
+__all__ = ['Statement',
+           'TTL',
+           'ThrottledError',
+           'TickerBundle',
+           'background',
+           'background_gradient',
+           'cache_miss',
+           'fetch_bundle',
+           'freshness',
+           'gated',
+           'get_cache',
+           'get_client',
+           'get_gateway',
+           'gradient_palette',
+           'max_age',
+           'memory_ttl',
+           'palette_css',
+           'parse_statement',
+           'persistent',
+           'prefetch',
+           'register_client',
+           'styled_table',
+           'timed']
+
+# Import the persistent cache helpers from the 'disk_cache' module
+from .disk_cache import TTL, freshness, get_cache, max_age, memory_ttl, persistent
+# Import the concurrent per-ticker fetch from the 'bundle' module
+from .bundle import TickerBundle, fetch_bundle
+# Import the rate limited, coalescing upstream gateway from the 'gateway' module
+from .gateway import ThrottledError, background, gated, get_client, get_gateway, register_client
+# Import the compact financial statement from the 'statement' module
+from .statement import Statement, parse_statement
+# Import the low priority background prefetch from the 'prefetch' module
+from .prefetch import prefetch
+# Import the cached, vectorized table styling from the 'styling' module
+from .styling import background_gradient, gradient_palette, palette_css, styled_table
+# Import the timing spans and cache counters from the 'metrics' module
+from .metrics import cache_miss, timed
@@ -0,0 +1,73 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+from .statement import Statement
+
+
+@dataclass
+class TickerBundle:
+    # everything a page needs for one ticker, fetched in a single round
+    ticker: str
+    overview: Optional[Tuple[dict, Any]] = None
+    balance_sheet: Optional[Statement] = None
+    income_statement: Optional[Statement] = None
+    cash_flow: Optional[Statement] = None
+    weekly_prices: Optional[pd.DataFrame] = None
+    news: Optional[list] = None
+    # the exception raised by each part that could not be fetched, keyed by the field name
+    errors: Dict[str, Exception] = field(default_factory=dict)
+
+    def failed(self, part: str) -> bool:
+        return part in self.errors
+
+
+# the names of the parts that can be fetched, in the order of the dataclass fields
+BUNDLE_PARTS = [f.name for f in fields(TickerBundle) if f.name not in ('ticker', 'errors')]
+
+
+def in_caller_context(func: Callable) -> Callable:
+    # wrap a function to run in a worker thread the way it would run in the calling thread: in a copy of the
+    # caller's context variables (its request priority) and with the caller's Streamlit script run context,
+    # without which st.cache_data computes the result but does not store it
+    context = contextvars.copy_context()
+    script_run_ctx = get_script_run_ctx()
+
+    def run(*args, **kwargs):
+        thread = threading.current_thread()
+        previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+        setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, script_run_ctx)
+        try:
+            return context.run(func, *args, **kwargs)
+        finally:
+            # pool threads are reused, so the context of this session is not left behind for the next task
+            setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+    return run
+
+
+def fetch_bundle(ticker: str, fetchers: Dict[str, Callable[[str], Any]]) -> TickerBundle:
+    # run every fetcher for the ticker at the same time, so a cold ticker costs the slowest call
+    # instead of the sum of all calls, read the docs https://docs.python.org/3/library/concurrent.futures.html
+    unknown = set(fetchers) - set(BUNDLE_PARTS)
+    if unknown:
+        raise ValueError(f'Unknown bundle parts: {sorted(unknown)}')
+
+    bundle = TickerBundle(ticker=ticker)
+    with ThreadPoolExecutor(max_workers=max(len(fetchers), 1)) as executor:
+        # every fetcher runs in the caller's context, so it keeps the caller's request priority
+        # and its result is stored in Streamlit's cache
+        futures = {part: executor.submit(in_caller_context(fetcher), ticker)
+                   for part, fetcher in fetchers.items()}
+        for part, future in futures.items():
+            # a part that fails is recorded in errors, so the other parts can still be shown
+            try:
+                setattr(bundle, part, future.result())
+            except Exception as error:
+                bundle.errors[part] = error
+    return bundle
@@ -0,0 +1,261 @@
+import contextvars
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+
+from .gateway import background
+from .metrics import count
+
+
+# time-to-live of every data type kept in the persistent cache
+# statements only change when a company reports (quarterly), the overview is refreshed daily
+# and the weekly price series gets a new bar once a week, the daily series once a day
+# the list of news is refreshed every hour, while a published article (and its summary) rarely changes
+# the listing of all symbols is downloaded again once a day
+TTL = {'statement': timedelta(days=90),
+       'overview': timedelta(days=1),
+       'prices': timedelta(days=7),
+       'daily_prices': timedelta(days=1),
+       'sector': timedelta(days=1),
+       'news': timedelta(hours=1),
+       'article': timedelta(days=7),
+       'summary': timedelta(days=30),
+       'listing': timedelta(days=1),
+       'schedule': timedelta(days=365)}
+
+# how long after its ttl an entry is still shown while a fresh copy is fetched in the background (stale-while-revalidate),
+# a user gets an instant answer that is at most this much older than usual, past it the entry is fetched again first
+STALE_WHILE_REVALIDATE = {'statement': timedelta(days=365),
+                          'overview': timedelta(days=7),
+                          'prices': timedelta(days=28),
+                          'daily_prices': timedelta(days=7),
+                          'sector': timedelta(days=7),
+                          'news': timedelta(days=1)}
+
+# Streamlit's in-memory caches keep a result at most this long before reading the disk cache again,
+# so a refresh by the cache warmer or by another process shows up without waiting for the whole ttl
+MEMORY_TTL = timedelta(hours=1)
+
+# the number of threads that fetch fresh copies of stale entries
+REVALIDATE_WORKERS = 2
+
+# the cache lives in a directory shared by every worker process, configurable through environment variables
+CACHE_DIR = os.environ.get('STOCK_ANALYSIS_CACHE_DIR', '.cache')
+# once the cache grows past this size the least recently used entries are evicted
+MAX_CACHE_BYTES = int(os.environ.get('STOCK_ANALYSIS_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+class DiskCache:
+    # a key/value store on top of SQLite, read the docs https://docs.python.org/3/library/sqlite3.html
+    # SQLite handles the locking between processes, so every Streamlit worker and the CLI tools can share one file
+
+    def __init__(self, path: str, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        # sqlite connections can not be shared between threads, so every thread opens its own
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as con:
+            con.execute('CREATE TABLE IF NOT EXISTS entries ('
+                        'key TEXT PRIMARY KEY, kind TEXT NOT NULL, created REAL NOT NULL, '
+                        'accessed REAL NOT NULL, size INTEGER NOT NULL, value BLOB NOT NULL)')
+            con.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def _connection(self) -> sqlite3.Connection:
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30)
+            # write-ahead logging lets readers in other processes continue while one process writes
+            # read the docs https://www.sqlite.org/wal.html
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('PRAGMA synchronous=NORMAL')
+            self._local.con = con
+        return con
+
+    def get(self, key: str, ttl: Optional[timedelta] = None) -> Tuple[bool, Any]:
+        # return a (hit, value) pair, entries older than the ttl count as a miss
+        hit, value, age = self.lookup(key, ttl)
+        return hit, value
+
+    def lookup(self, key: str, max_age: Optional[timedelta] = None) -> Tuple[bool, Any, float]:
+        # return a (hit, value, age in seconds) triple, entries older than max_age count as a miss
+        con = self._connection()
+        row = con.execute('SELECT created, value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return False, None, 0.0
+        created, blob = row
+        age = time.time() - created
+        if max_age is not None and age > max_age.total_seconds():
+            return False, None, age
+        with con:
+            con.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+        return True, pickle.loads(blob), age
+
+    def set(self, key: str, kind: str, value: Any):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        con = self._connection()
+        with con:
+            con.execute('INSERT OR REPLACE INTO entries (key, kind, created, accessed, size, value) '
+                        'VALUES (?, ?, ?, ?, ?, ?)', (key, kind, now, now, len(blob), blob))
+        self.evict()
+
+    def created(self, key: str) -> Optional[float]:
+        # the time an entry was written (seconds since the epoch), or None if there is none
+        row = self._connection().execute('SELECT created FROM entries WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def delete(self, key: str):
+        con = self._connection()
+        with con:
+            con.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def size(self) -> int:
+        return self._connection().execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def evict(self):
+        # drop the least recently used entries until the cache is back under 90% of its size limit
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        con = self._connection()
+        with con:
+            freed = evicted = 0
+            for key, size in con.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall():
+                con.execute('DELETE FROM entries WHERE key = ?', (key,))
+                freed += size
+                evicted += 1
+                if freed >= target:
+                    break
+        count('cache_evictions', evicted, cache='disk')
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DiskCache:
+    # the cache is opened once per process on first use
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(os.path.join(CACHE_DIR, 'cache.sqlite'))
+    return _cache
+
+
+def make_key(name: str, args: tuple, kwargs: dict) -> str:
+    # build a readable key such as "get_balance_sheet('AAPL')"
+    parts = [repr(arg) for arg in args] + [f'{k}={v!r}' for k, v in sorted(kwargs.items())]
+    return f"{name}({', '.join(parts)})"
+
+
+def memory_ttl(kind: str) -> timedelta:
+    # the ttl of a data type in Streamlit's in-memory cache, in front of the disk cache
+    return min(TTL[kind], MEMORY_TTL)
+
+
+# the oldest entry the current thread or task accepts, set by the cache warmer and by revalidation
+_max_age = contextvars.ContextVar('max_age', default=None)
+
+
+@contextmanager
+def max_age(age: timedelta):
+    # inside this block, entries older than the age are fetched again before they are returned and stale entries are
+    # never served, every cached function called inside (and the functions they call) refreshes its data
+    token = _max_age.set(age)
+    try:
+        yield
+    finally:
+        _max_age.reset(token)
+
+
+def freshness(ttl: timedelta) -> Tuple[timedelta, Optional[timedelta]]:
+    # the age up to which an entry with this ttl is fresh, and the extra age up to which it can be served stale
+    # (nothing when a max_age block asked for fresh data)
+    age = _max_age.get()
+    if age is None:
+        return ttl, None
+    return min(ttl, age), timedelta(0)
+
+
+_revalidator = ThreadPoolExecutor(max_workers=REVALIDATE_WORKERS, thread_name_prefix='revalidate')
+# the entries that are being fetched again, so many readers of one stale entry start a single refresh
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+def revalidate(key: str, kind: str, refresh: Callable[[], Any]):
+    # fetch a fresh copy of a stale entry in the background with low priority, the stale copy is served until then
+    with _revalidating_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+    _revalidator.submit(_revalidate, key, kind, refresh)
+
+
+def _revalidate(key: str, kind: str, refresh: Callable[[], Any]):
+    try:
+        # the functions called by the refresh fetch their own stale entries too, instead of serving them
+        with background(), max_age(TTL[kind]):
+            refresh()
+    except Exception:
+        # the stale entry stays until a later read or the cache warmer tries again
+        count('cache_revalidations', kind=kind, result='error')
+    else:
+        count('cache_revalidations', kind=kind, result='ok')
+    finally:
+        with _revalidating_lock:
+            _revalidating.discard(key)
+
+
+def persistent(kind: str, name: Optional[str] = None, version: int = 1) -> Callable:
+    # decorator that stores the result of a function in the disk cache, using the ttl of its data type
+    # the function name is part of the key, so the Streamlit app and the CLI tools share the same entries
+    # bump the version when the type of the result changes, so entries in the old format are not returned
+    # an entry past its ttl is still returned at once while it is fetched again in the background,
+    # until it is older than the ttl plus the stale-while-revalidate time of its data type
+    # the decorated function's cached_at(*args) returns the time the entry of those arguments was written, or None
+    def decorator(func: Callable) -> Callable:
+        key_name = name or func.__qualname__
+        if version > 1:
+            key_name = f'{key_name}@v{version}'
+
+        def fetch(key: str, *args, **kwargs):
+            # exceptions propagate before anything is written, so failed calls are never cached
+            value = func(*args, **kwargs)
+            get_cache().set(key, kind, value)
+            return value
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            key = make_key(key_name, args, kwargs)
+            ttl, stale = freshness(TTL[kind])
+            if stale is None:
+                stale = STALE_WHILE_REVALIDATE.get(kind, timedelta(0))
+            hit, value, age = cache.lookup(key, max_age=ttl + stale)
+            if hit and age <= ttl.total_seconds():
+                count('cache_requests', cache='disk', function=key_name, result='hit')
+                return value
+            if hit:
+                count('cache_requests', cache='disk', function=key_name, result='stale')
+                revalidate(key, kind, lambda: fetch(key, *args, **kwargs))
+                return value
+            count('cache_requests', cache='disk', function=key_name, result='miss')
+            return fetch(key, *args, **kwargs)
+
+        def cached_at(*args, **kwargs) -> Optional[float]:
+            return get_cache().created(make_key(key_name, args, kwargs))
+
+        wrapper.cached_at = cached_at
+        return wrapper
+
+    return decorator
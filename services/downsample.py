@@ -0,0 +1,77 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+# the app uses the centered layout, whose charts are about this many pixels wide,
+# more points than pixels are not visible and only make the page heavier
+CHART_WIDTH = 700
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: keep the point of every bucket that forms the largest triangle with the
+    # point kept in the previous bucket and the average of the next bucket, which preserves the visual shape
+    # read more at https://skemman.is/bitstream/1946/15343/3/SS_MSthesis.pdf
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    # the first and last points are always kept, the points in between are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # the average point of the next bucket, the last bucket looks at the last point
+        next_start, next_end = (edges[bucket + 1], edges[bucket + 2]) if bucket + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # twice the area of the triangles, computed for the whole bucket at once
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    # keep the lowest and the highest point of every bucket, so no peak or dip is lost
+    n = len(y)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+    size = -(-n // buckets)
+    # pad the last bucket with NaN so all buckets can be reduced in one vectorized call
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    valid = ~np.isnan(padded).all(axis=1)
+    lows = offsets[valid] + np.nanargmin(padded[valid], axis=1)
+    highs = offsets[valid] + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+
+def downsample(frame: pd.DataFrame, columns: List[str], max_points: int = CHART_WIDTH,
+               method: str = 'lttb') -> pd.DataFrame:
+    # reduce the rows of a chart frame to about max_points, keeping the shape of every plotted column
+    frame = frame[columns]
+    if len(frame) <= max_points or not columns:
+        return frame
+    if isinstance(frame.index, pd.DatetimeIndex):
+        x = frame.index.asi8
+    else:
+        x = np.arange(len(frame))
+    # every column gets an equal share of the points and the rows kept for any column are kept for all
+    budget = max(max_points // len(columns), 3)
+    indices = []
+    for column in columns:
+        y = frame[column].to_numpy(dtype=np.float64)
+        if method == 'minmax':
+            indices.append(minmax_indices(y, budget))
+        else:
+            indices.append(lttb_indices(x, np.nan_to_num(y), budget))
+    return frame.iloc[np.unique(np.concatenate(indices))]
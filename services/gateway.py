@@ -0,0 +1,278 @@
+import collections
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable, Optional
+
+from . import metrics
+
+
+# interactive requests (a user waiting on a page) are served before background requests (prefetch, warmers)
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# the number of Alpha Vantage calls our plan allows per minute, the free tier allows 5
+CALLS_PER_MINUTE = float(os.environ.get('ALPHA_VANTAGE_CALLS_PER_MINUTE', 5))
+
+# Alpha Vantage answers with a note instead of data when the quota is used up,
+# these fragments identify such a note in a response or in the ValueError raised by the alpha_vantage library
+THROTTLE_MARKERS = ('thank you for using alpha vantage',
+                    'call frequency',
+                    'rate limit',
+                    'premium plan')
+
+# the priority of the requests made by the current thread or task
+_priority = contextvars.ContextVar('priority', default=INTERACTIVE)
+
+
+class ThrottledError(Exception):
+    # raised instead of returning a throttle note, so the note is never cached as data
+    pass
+
+
+@contextmanager
+def background():
+    # run the requests made inside this block with background priority
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_throttle_message(message: Any) -> bool:
+    return isinstance(message, str) and any(marker in message.lower() for marker in THROTTLE_MARKERS)
+
+
+def is_throttle_response(value: Any) -> bool:
+    # the alpha_vantage library returns (data, meta_data) tuples, the note can be in the data part
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, dict):
+        return any(is_throttle_message(value.get(key)) for key in ('Note', 'Information'))
+    return False
+
+
+class TokenBucket:
+    # a token bucket rate limiter with a priority queue of waiters
+    # read more at https://en.wikipedia.org/wiki/Token_bucket
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._condition = threading.Condition()
+        # heap of [priority, arrival] tickets, the smallest ticket is served first
+        self._waiters = []
+        self._arrivals = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ticket(self, priority: int = INTERACTIVE) -> list:
+        # a place in the line, a list so its priority can be raised while it waits (see promote)
+        return [priority, next(self._arrivals)]
+
+    def promote(self, ticket: list, priority: int):
+        # serve a ticket with a higher priority (a smaller number), for example when a user is waiting on the result
+        # of a background request, a ticket that already got its token is left as it is
+        with self._condition:
+            if priority >= ticket[0]:
+                return
+            ticket[0] = priority
+            if ticket in self._waiters:
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def acquire(self, priority: int = INTERACTIVE, timeout: Optional[float] = None, ticket: Optional[list] = None):
+        ticket = self.ticket(priority) if ticket is None else ticket
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    is_next = self._waiters[0] is ticket
+                    if is_next and self.tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self.tokens -= 1
+                        # wake up the next waiter in line
+                        self._condition.notify_all()
+                        return
+                    # the waiter at the front sleeps until its token is ready, the others until they are woken up
+                    wait = (1 - self.tokens) / self.rate if is_next else None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError('Timed out waiting for the Alpha Vantage rate limit')
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._condition.wait(wait)
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._condition.notify_all()
+                raise
+
+    def available(self) -> float:
+        # the number of tokens in the bucket, the calls that can start right now without waiting
+        with self._condition:
+            self._refill()
+            return self.tokens
+
+    def drain(self):
+        # empty the bucket after a throttle response, so the next calls wait for fresh tokens
+        with self._condition:
+            self._refill()
+            self.tokens = 0
+
+
+class Gateway:
+    # every upstream call of the process goes through one gateway, which
+    # 1. coalesces identical requests that are in flight, so many waiters share one upstream call
+    # 2. enforces the plan's quota with a token bucket, interactive requests first
+    # 3. turns throttle notes into ThrottledError, so they never reach a cache
+
+    def __init__(self, calls_per_minute: float = CALLS_PER_MINUTE):
+        self.calls_per_minute = calls_per_minute
+        self.bucket = TokenBucket(calls_per_minute)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        # the times of the latest upstream calls, to compare the calls of the last minute with the quota
+        self._recent = collections.deque(maxlen=4096)
+
+    def call(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        priority = _priority.get()
+        with self._lock:
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                # the bucket is kept with the ticket, set_quota may replace it while the call waits
+                inflight = Future(), self.bucket, self.bucket.ticket(priority)
+                self._inflight[key] = inflight
+        future, bucket, ticket = inflight
+        if not leader:
+            # someone else is already fetching the same data, wait for their result,
+            # a user joining a background request moves it up to the user's priority
+            bucket.promote(ticket, priority)
+            metrics.count('upstream_coalesced', client=key[0])
+            return future.result()
+
+        try:
+            bucket.acquire(ticket=ticket)
+            result = self._upstream(key[0], func, *args, **kwargs)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _upstream(self, client: str, func: Callable, *args, **kwargs) -> Any:
+        self._recent.append(time.monotonic())
+        try:
+            result = func(*args, **kwargs)
+        except ValueError as error:
+            if is_throttle_message(str(error)):
+                self.bucket.drain()
+                metrics.count('upstream_calls', client=client, result='throttled')
+                raise ThrottledError(str(error)) from error
+            metrics.count('upstream_calls', client=client, result='error')
+            raise
+        except Exception:
+            metrics.count('upstream_calls', client=client, result='error')
+            raise
+        if is_throttle_response(result):
+            self.bucket.drain()
+            metrics.count('upstream_calls', client=client, result='throttled')
+            raise ThrottledError(str(result))
+        metrics.count('upstream_calls', client=client, result='ok')
+        if metrics.ENABLED:
+            metrics.observe('upstream_payload_bytes', metrics.payload_size(result), client=client)
+        return result
+
+    def set_quota(self, calls_per_minute: float):
+        # change the quota, for example to leave a worker process (the cache warmer) only its share of the plan,
+        # calls that are already waiting keep waiting on the old bucket
+        self.calls_per_minute = calls_per_minute
+        self.bucket = TokenBucket(calls_per_minute)
+
+    def calls_last_minute(self) -> int:
+        # the number of upstream calls started in the last 60 seconds
+        since = time.monotonic() - 60
+        return sum(1 for started in list(self._recent) if started > since)
+
+
+
+class GatedClient:
+    # wraps an alpha_vantage client, so every method call goes through the gateway
+
+    def __init__(self, client: Any, name: str, gateway: Gateway):
+        self._client = client
+        self._name = name
+        self._gateway = gateway
+
+    def __getattr__(self, attr: str) -> Any:
+        value = getattr(self._client, attr)
+        if not callable(value):
+            return value
+
+        def gated_method(*args, **kwargs):
+            key = (self._name, attr, args, tuple(sorted(kwargs.items())))
+            return self._gateway.call(key, value, *args, **kwargs)
+
+        return gated_method
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> Gateway:
+    # one gateway per process, shared by every Streamlit session
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = Gateway()
+            metrics.gauge('upstream_calls_last_minute', _gateway.calls_last_minute)
+            metrics.gauge('upstream_quota_per_minute', lambda: _gateway.calls_per_minute)
+            metrics.gauge('upstream_tokens', lambda: _gateway.bucket.available())
+    return _gateway
+
+
+def gated(client: Any, name: str) -> GatedClient:
+    # route the calls of an alpha_vantage client through the process-wide gateway
+    return GatedClient(client, name, get_gateway())
+
+
+# how to build each API client by name, and the clients that were built
+_factories = {}
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def register_client(name: str, factory: Callable[[], Any]):
+    # register how to build an API client, it is only built (and its library imported) when it is first used,
+    # so starting the app and running the script again for a new session do not pay for clients nobody uses
+    with _clients_lock:
+        _factories[name] = factory
+
+
+def get_client(name: str) -> GatedClient:
+    # the gated client registered under the name, built on first use and shared by every session of the process
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = gated(_factories[name](), name)
+    return client
@@ -0,0 +1,44 @@
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+
+# (connect, read) timeouts in seconds for every request made with the shared session
+TIMEOUT = (3.05, 10)
+# idle connections kept open per host
+POOL_SIZE = 16
+# transient failures are retried with an exponential backoff
+# read the docs https://urllib3.readthedocs.io/en/stable/reference/urllib3.util.html#urllib3.util.Retry
+RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+              allowed_methods=frozenset(['GET', 'HEAD']))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    # one pooled session per process, so repeated requests to the same host reuse their connections
+    # read the docs https://requests.readthedocs.io/en/latest/user/advanced/#session-objects
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=RETRY)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            # some news sites refuse the default python-requests user agent
+            session.headers['User-Agent'] = 'Mozilla/5.0 (compatible; Stock-Analysis)'
+            # record the size of every response body, read the docs https://requests.readthedocs.io/en/latest/user/advanced/#event-hooks
+            if metrics.ENABLED:
+                session.hooks['response'].append(record_payload)
+            _session = session
+    return _session
+
+
+def record_payload(response: requests.Response, *args, **kwargs):
+    metrics.observe('http_payload_bytes', len(response.content), host=urlsplit(response.url).netloc)
@@ -0,0 +1,328 @@
+import bisect
+import contextvars
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# metrics are off unless switched on, or unless one of the exports is configured,
+# switched off every instrumented function is the plain function and every counter returns right away
+EXPORT_LOG = os.environ.get('STOCK_ANALYSIS_METRICS_LOG', '')
+EXPORT_PROMETHEUS = os.environ.get('STOCK_ANALYSIS_METRICS_PROMETHEUS', '')
+ENABLED = os.environ.get('STOCK_ANALYSIS_METRICS', '') not in ('', '0') or bool(EXPORT_LOG or EXPORT_PROMETHEUS)
+# seconds between two exports
+EXPORT_INTERVAL = float(os.environ.get('STOCK_ANALYSIS_METRICS_INTERVAL', 60))
+# every exported metric name starts with this prefix
+PREFIX = 'stock_analysis_'
+
+# the upper bounds of the histogram buckets, in seconds for spans and in bytes for payloads
+SPAN_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, math.inf)
+PAYLOAD_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, math.inf)
+
+# the type, help text and buckets of every metric
+# read the docs https://prometheus.io/docs/instrumenting/exposition_formats/#text-based-format
+METRICS = {'span_seconds': ('histogram', 'Time spent in an instrumented function, cache hits included', SPAN_BUCKETS),
+           'cache_requests': ('counter', 'Lookups of a cache by result (hit, stale or miss)', None),
+           'cache_evictions': ('counter', 'Entries evicted from a cache', None),
+           'cache_revalidations': ('counter', 'Stale entries fetched again in the background by result', None),
+           'warmer_refreshes': ('counter', 'Parts of a watchlist ticker checked by the cache warmer by result', None),
+           'article_revalidated': ('counter', 'Expired articles the news site confirmed unchanged (304)', None),
+           'upstream_calls': ('counter', 'Calls made to an upstream API by result (ok, throttled or error)', None),
+           'upstream_coalesced': ('counter', 'Requests that shared an identical upstream call already in flight',
+                                  None),
+           'upstream_payload_bytes': ('histogram', 'Approximate size of an upstream response', PAYLOAD_BUCKETS),
+           'http_payload_bytes': ('histogram', 'Size of a response body fetched with the shared session',
+                                  PAYLOAD_BUCKETS),
+           'upstream_calls_last_minute': ('gauge', 'Upstream API calls made in the last 60 seconds', None),
+           'upstream_quota_per_minute': ('gauge', 'Upstream API calls the plan allows per minute', None),
+           'upstream_tokens': ('gauge', 'Calls the rate limiter can make right now without waiting', None)}
+
+# the labels of one series, as sorted (name, value) pairs
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    # counts of observations per bucket, like a Prometheus histogram, but the counts are not cumulative
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        # the upper bound of the bucket the q-quantile falls into, an estimate that is never too low
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+
+class Registry:
+    # the counters, histograms and gauges of one process, every Streamlit session of the process adds to the same ones
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        # gauges are read when the metrics are collected, a gauge function returns its value
+        self._gauges: Dict[Tuple[str, Labels], Callable[[], float]] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def count(self, name: str, value: float, labels: Labels):
+        with self._lock:
+            self._counters[name, labels] = self._counters.get((name, labels), 0) + value
+
+    def observe(self, name: str, value: float, labels: Labels):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[name, labels] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def gauge(self, name: str, func: Callable[[], float], labels: Labels):
+        with self._lock:
+            self._gauges[name, labels] = func
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+    def collect(self) -> List[dict]:
+        # one dict per series, sorted by metric name and labels
+        with self._lock:
+            counters = list(self._counters.items())
+            # Prometheus expects the cumulative count of every bucket
+            histograms = [(key, {'buckets': dict(zip(histogram.bounds, itertools.accumulate(histogram.counts))),
+                                 'sum': histogram.sum,
+                                 'count': histogram.count,
+                                 'p50': histogram.quantile(0.5),
+                                 'p95': histogram.quantile(0.95)})
+                          for key, histogram in self._histograms.items()]
+            gauges = list(self._gauges.items())
+        series = [{'name': name, 'type': 'counter', 'labels': dict(labels), 'value': value}
+                  for (name, labels), value in counters]
+        series += [dict(name=name, type='histogram', labels=dict(labels), **values)
+                   for (name, labels), values in histograms]
+        for (name, labels), func in gauges:
+            try:
+                series.append({'name': name, 'type': 'gauge', 'labels': dict(labels), 'value': float(func())})
+            except Exception:
+                # a gauge that can not be read is left out of this collection
+                continue
+        return sorted(series, key=lambda item: (item['name'], sorted(item['labels'].items())))
+
+
+_registry = Registry()
+# the functions that ran their body because the Streamlit cache above them missed, see cache_miss
+_misses = contextvars.ContextVar('misses', default=None)
+
+
+def get_registry() -> Registry:
+    return _registry
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def count(name: str, value: float = 1, **labels):
+    # add to a counter, for example count('cache_requests', cache='disk', result='hit')
+    if not ENABLED:
+        return
+    _registry.count(name, value, _labels(labels))
+
+
+def observe(name: str, value: float, **labels):
+    # record one observation of a histogram, for example a payload size
+    if not ENABLED:
+        return
+    _registry.observe(name, value, _labels(labels))
+
+
+def gauge(name: str, func: Callable[[], float], **labels):
+    # register a function that returns the current value of a gauge, it is called when the metrics are collected
+    if not ENABLED:
+        return
+    _registry.gauge(name, func, _labels(labels))
+
+
+@contextmanager
+def span(name: str):
+    # time the code inside this block, the duration is recorded in the span_seconds histogram under the name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('span_seconds', time.perf_counter() - start, span=name)
+
+
+def timed(name: str, cache: Optional[str] = None) -> Callable:
+    # decorator that records every call of a function as a span,
+    # with cache set, the function is cached by Streamlit and its body is decorated with cache_miss,
+    # so every call also counts as a hit or a miss of that cache
+    def decorator(func: Callable) -> Callable:
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            misses = []
+            token = _misses.set(misses)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe('span_seconds', time.perf_counter() - start, span=name)
+                _misses.reset(token)
+                if cache is not None:
+                    count('cache_requests', cache=cache, function=name, result='miss' if misses else 'hit')
+
+        return wrapper
+
+    return decorator
+
+
+def cache_miss(func: Callable) -> Callable:
+    # decorator for the body of a function cached by st.cache_data, place it right below the cache decorator:
+    # the body only runs when the cache misses, which tells the timed wrapper above the cache what happened
+    if not ENABLED:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        misses = _misses.get()
+        if misses is not None:
+            misses.append(True)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def payload_size(value) -> int:
+    # the approximate size of an upstream response in bytes, a data frame by its memory and anything else by its JSON
+    # the alpha_vantage library returns (data, meta_data) tuples, only the data counts
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+
+def snapshot() -> dict:
+    # every metric of this process at this moment
+    return {'time': time.time(), 'pid': os.getpid(), 'started': _registry.started, 'metrics': _registry.collect()}
+
+
+def _label_text(labels: dict, extra: Optional[dict] = None) -> str:
+    labels = dict(labels, **(extra or {}))
+    if not labels:
+        return ''
+    escaped = {name: str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+               for name, value in labels.items()}
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped.items()) + '}'
+
+
+def _number(value: float) -> str:
+    return '+Inf' if value == math.inf else repr(float(value))
+
+
+def prometheus_text(metrics: Optional[List[dict]] = None) -> str:
+    # the metrics in the Prometheus text exposition format
+    # read the docs https://prometheus.io/docs/instrumenting/exposition_formats/#text-based-format
+    metrics = _registry.collect() if metrics is None else metrics
+    lines = []
+    for name in sorted({item['name'] for item in metrics}):
+        kind, help_text, _ = METRICS[name]
+        full_name = PREFIX + name + ('_total' if kind == 'counter' else '')
+        lines.append(f'# HELP {full_name} {help_text}')
+        lines.append(f'# TYPE {full_name} {kind}')
+        for item in metrics:
+            if item['name'] != name:
+                continue
+            if kind != 'histogram':
+                lines.append(f"{full_name}{_label_text(item['labels'])} {_number(item['value'])}")
+                continue
+            for bound, cumulative in item['buckets'].items():
+                lines.append(f"{full_name}_bucket{_label_text(item['labels'], {'le': _number(bound)})} {cumulative}")
+            lines.append(f"{full_name}_sum{_label_text(item['labels'])} {_number(item['sum'])}")
+            lines.append(f"{full_name}_count{_label_text(item['labels'])} {item['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def _plain(value):
+    # JSON has no infinity, the last bucket of a histogram is written like Prometheus writes it
+    if isinstance(value, dict):
+        return {(_number(key) if isinstance(key, float) else key): _plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, float) and value == math.inf:
+        return '+Inf'
+    return value
+
+
+def json_line(metrics: Optional[dict] = None) -> str:
+    # one line of the JSON-lines log, a whole snapshot of the metrics
+    return json.dumps(_plain(snapshot() if metrics is None else metrics)) + '\n'
+
+
+def export(log_path: str = EXPORT_LOG, prometheus_path: str = EXPORT_PROMETHEUS):
+    # append a snapshot to the JSON-lines log and replace the Prometheus text file,
+    # the text file is meant for the textfile collector of the node exporter, which reads every *.prom file of a
+    # directory, so {pid} in a path is replaced with the process id to give every worker process its own file
+    # read the docs https://github.com/prometheus/node_exporter#textfile-collector
+    current = snapshot()
+    if log_path:
+        with open(log_path.format(pid=os.getpid()), 'a') as file:
+            file.write(json_line(current))
+    if prometheus_path:
+        path = prometheus_path.format(pid=os.getpid())
+        # the collector may read the file at any time, so it is written next to it and renamed
+        with open(path + '.tmp', 'w') as file:
+            file.write(prometheus_text(current['metrics']))
+        os.replace(path + '.tmp', path)
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(interval: float = EXPORT_INTERVAL):
+    # export the metrics every interval seconds in a background thread, once per process,
+    # nothing is started unless a log or Prometheus path is configured
+    global _exporter
+    if not (ENABLED and (EXPORT_LOG or EXPORT_PROMETHEUS)):
+        return
+    with _exporter_lock:
+        if _exporter is not None:
+            return
+        _exporter = threading.Thread(target=_export_forever, args=(interval,), name='metrics', daemon=True)
+        _exporter.start()
+
+
+def _export_forever(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            export()
+        except OSError:
+            # a full disk or a missing directory must not stop the app, the next interval tries again
+            pass
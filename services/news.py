@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+
+from .disk_cache import TTL, get_cache, make_key, persistent
+from .http import TIMEOUT, get_session
+from .metrics import count
+
+
+# the number of articles fetched ahead of time when the news of a ticker is shown
+PREFETCH_ARTICLES = 8
+# only the element holding the article text is parsed, the rest of the page is skipped
+# read the docs https://www.crummy.com/software/BeautifulSoup/bs4/doc/#parsing-only-part-of-a-document
+ARTICLE_TAG = 'div'
+ARTICLE_ATTRS = {'class': 'caas-body'}
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_ARTICLES, thread_name_prefix='news')
+# articles that are being fetched, so a prefetch and a click on the same article share one request
+_pending = {}
+# reentrant, because the callback that forgets a finished article can run inside submit_article
+_pending_lock = threading.RLock()
+
+
+def extract_article_body(content: bytes) -> str:
+    # BeautifulSoup and lxml are imported here, so they are only loaded once the first article is fetched
+    from bs4 import BeautifulSoup, SoupStrainer
+    soup = BeautifulSoup(content, features='lxml', parse_only=SoupStrainer(ARTICLE_TAG, attrs=ARTICLE_ATTRS))
+    body = soup.find(ARTICLE_TAG, attrs=ARTICLE_ATTRS)
+    if body is None:
+        raise ValueError('The page does not have an article body')
+    return body.text
+
+
+def article_text(url: str) -> str:
+    # return the text of a news article from the persistent cache, the page is only downloaded again
+    # after the ttl and then only if its ETag or Last-Modified header says it changed
+    cache = get_cache()
+    key = make_key('article_text', (url,), {})
+    hit, entry = cache.get(key)
+    if hit and time.time() - entry['fetched'] < TTL['article'].total_seconds():
+        count('cache_requests', cache='disk', function='article_text', result='hit')
+        return entry['text']
+    count('cache_requests', cache='disk', function='article_text', result='miss')
+
+    headers = {}
+    if hit and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if hit and entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+    response = get_session().get(url, headers=headers, timeout=TIMEOUT)
+    etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+    if hit and response.status_code == 304:
+        count('article_revalidated')
+        text = entry['text']
+        # a 304 response does not have to repeat the validators, so the stored ones are kept
+        etag = etag or entry['etag']
+        last_modified = last_modified or entry['last_modified']
+    else:
+        response.raise_for_status()
+        text = extract_article_body(response.content)
+    # a new copy keeps only the validators it was sent with, so the next request never asks about an older copy
+    cache.set(key, 'article', {'text': text, 'fetched': time.time(), 'etag': etag, 'last_modified': last_modified})
+    return text
+
+
+@persistent('news', name='get_news')
+def news_items(ticker: str) -> list:
+    # return the latest news of a ticker from Yahoo Finance, kept in the persistent cache so every process
+    # (and the cache warmer) shares one list per ttl
+    # yfinance is imported here, so it is only loaded once the news of a ticker is fetched
+    import yfinance as yf
+    return yf.Ticker(ticker=ticker).get_news()
+
+
+def submit_article(url: str) -> Future:
+    # fetch an article in the background, an article that is already being fetched is not fetched twice
+    with _pending_lock:
+        future = _pending.get(url)
+        if future is None:
+            future = _executor.submit(article_text, url)
+            _pending[url] = future
+            future.add_done_callback(lambda _: _forget(url))
+    return future
+
+
+def _forget(url: str):
+    with _pending_lock:
+        _pending.pop(url, None)
+
+
+def prefetch_articles(urls: List[str]) -> List[Future]:
+    # start fetching the given articles concurrently without waiting for them
+    return [submit_article(url) for url in urls[:PREFETCH_ARTICLES]]
@@ -0,0 +1,86 @@
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .statement import Statement, parse_statement
+
+
+# the directory of the columnar panels written by screener.py, configurable through an environment variable
+PANEL_DIR = os.environ.get('STOCK_ANALYSIS_PANEL_DIR', 'panels')
+# the file holding every standardized statement of the coverage list
+STATEMENTS_PANEL = 'statements.parquet'
+# the file holding the name, sector and industry of every company of the coverage list
+COMPANIES_PANEL = 'companies.parquet'
+# the fields of the company overview kept in the companies panel, and their column names
+COMPANY_FIELDS = {'Name': 'name', 'Sector': 'sector', 'Industry': 'industry', 'MarketCapitalization': 'market_cap'}
+# the statements kept in the panel
+STATEMENTS = ['balance_sheet', 'income_statement', 'cash_flow']
+# every row of the panel is keyed by these columns
+PANEL_KEY = ['ticker', 'statement', 'line_item', 'fiscal_date']
+
+
+def statement_to_long(ticker: str, name: str, statement: Statement) -> pd.DataFrame:
+    # lay a statement out as one row per (line item, fiscal date), line item by line item
+    n_items, n_dates = statement.values.shape
+    return pd.DataFrame({'ticker': ticker,
+                         'statement': name,
+                         'line_item': np.repeat(statement.line_items.to_numpy(dtype=object), n_dates),
+                         'fiscal_date': np.tile(statement.fiscal_dates.to_numpy(dtype=object), n_items),
+                         'value': statement.values.ravel(),
+                         'currency': statement.currency})
+
+
+def standardize_ticker(ticker: str, raw_statements: Dict[str, pd.DataFrame], fetched: float) -> pd.DataFrame:
+    # standardize the raw statements of one ticker into panel rows, this runs in the screener's process pool,
+    # every row keeps the time the raw statements were fetched (seconds since the epoch)
+    frames = [statement_to_long(ticker, name, parse_statement(raw)) for name, raw in raw_statements.items()]
+    rows = pd.concat(frames, ignore_index=True)
+    rows['fetched'] = fetched
+    return rows
+
+
+def load_panel(panel_dir: str = PANEL_DIR) -> Optional[pd.DataFrame]:
+    # load the statements panel indexed by (ticker, statement), or None if the screener has not written one yet
+    # read the docs https://pandas.pydata.org/docs/reference/api/pandas.read_parquet.html
+    path = os.path.join(panel_dir, STATEMENTS_PANEL)
+    if not os.path.exists(path):
+        return None
+    panel = pd.read_parquet(path)
+    if 'fetched' not in panel.columns:
+        # panels written before the fetch time was kept count as fetched when the file was written
+        panel['fetched'] = os.path.getmtime(path)
+    # a stable sort keeps the line items of each statement in their reported order
+    return panel.set_index(['ticker', 'statement']).sort_index(kind='mergesort')
+
+
+def panel_statement(panel: Optional[pd.DataFrame], ticker: str, name: str,
+                    newer_than: float = 0) -> Optional[Statement]:
+    # rebuild the Statement of a ticker from the panel, or return None if the panel does not have it
+    # or its copy was fetched before newer_than (seconds since the epoch)
+    if panel is None or (ticker, name) not in panel.index:
+        return None
+    rows = panel.loc[(ticker, name)]
+    if rows['fetched'].iloc[0] < newer_than:
+        return None
+    line_items = pd.Index(pd.unique(rows['line_item']))
+    fiscal_dates = pd.Index(pd.unique(rows['fiscal_date']), name='fiscalDateEnding')
+    values = np.ascontiguousarray(rows['value'].to_numpy()).reshape(len(line_items), len(fiscal_dates))
+    return Statement(line_items=line_items, fiscal_dates=fiscal_dates, values=values,
+                     currency=rows['currency'].iloc[0])
+
+
+def company_row(ticker: str, overview: dict) -> pd.DataFrame:
+    # the row of the companies panel for one ticker, built from its company overview
+    row = {column: overview.get(field) for field, column in COMPANY_FIELDS.items()}
+    row['market_cap'] = pd.to_numeric(row['market_cap'], errors='coerce')
+    return pd.DataFrame([row], index=pd.Index([ticker], name='ticker'))
+
+
+def load_companies(panel_dir: str = PANEL_DIR) -> Optional[pd.DataFrame]:
+    # load the companies panel indexed by ticker, or None if the screener has not written one yet
+    path = os.path.join(panel_dir, COMPANIES_PANEL)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
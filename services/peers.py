@@ -0,0 +1,150 @@
+import os
+import warnings
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .panel import PANEL_DIR
+from .ratios import compute_ratios, panel_observations
+
+
+# the file holding the metrics of every company of the coverage list, one row per (ticker, fiscal year)
+CROSS_SECTION = 'cross_section.parquet'
+# the line items compared between peers next to the ratios, in millions like the statements
+PEER_ITEMS = ['totalRevenue', 'grossProfit', 'operatingIncome', 'netIncome', 'totalAssets', 'totalLiabilities',
+              'totalShareholderEquity', 'operatingCashflow', 'capitalExpenditures']
+# the peers are the companies of the same industry, or of the same sector when the industry has fewer of them
+MIN_PEERS = 5
+# the percentiles of the peers shown for every metric
+QUANTILES = {'p25': 25, 'median': 50, 'p75': 75}
+
+
+def metric_frame(data: pd.DataFrame, ratios: pd.DataFrame) -> pd.DataFrame:
+    # the line items and ratios of every (ticker, fiscal date) row, as one row per (ticker, fiscal year),
+    # so companies with different fiscal year ends line up
+    frame = pd.concat([data.reindex(columns=PEER_ITEMS), ratios], axis=1)
+    frame = frame.loc[:, ~frame.columns.duplicated()]
+    tickers = frame.index.get_level_values('ticker')
+    years = pd.to_datetime(frame.index.get_level_values('fiscal_date')).year
+    frame.index = pd.MultiIndex.from_arrays([tickers, years], names=['ticker', 'year'])
+    # a company that moved its fiscal year end can report twice in one year, the later report is kept
+    frame = frame[~frame.index.duplicated(keep='last')]
+    frame.attrs = {}
+    return frame.sort_index()
+
+
+def build_cross_section(panel: pd.DataFrame) -> pd.DataFrame:
+    # the metrics of every company of a statements panel (see services.panel), computed for all of them at once
+    data = panel_observations(panel)
+    return metric_frame(data, compute_ratios(data))
+
+
+def update_cross_section(cross_section: Optional[pd.DataFrame], panel: pd.DataFrame,
+                         tickers: List[str]) -> pd.DataFrame:
+    # recompute the metrics of the given tickers (and of the tickers of the panel it does not have yet) only and keep
+    # the rows of the others, companies that are no longer in the panel are dropped
+    if cross_section is None:
+        return build_cross_section(panel)
+    in_panel = panel.index.get_level_values('ticker').unique()
+    rows = cross_section.index.get_level_values('ticker')
+    tickers = in_panel.intersection(tickers).union(in_panel.difference(rows))
+    kept = cross_section[rows.isin(in_panel) & ~rows.isin(tickers)]
+    if tickers.empty:
+        return kept
+    return pd.concat([kept, build_cross_section(panel.loc[list(tickers)])]).sort_index()
+
+
+def save_cross_section(cross_section: pd.DataFrame, panel_dir: str = PANEL_DIR):
+    # write to a temporary file first, so the app never reads a half written cross-section
+    path = os.path.join(panel_dir, CROSS_SECTION)
+    cross_section.to_parquet(path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def load_cross_section(panel_dir: str = PANEL_DIR) -> Optional[pd.DataFrame]:
+    # load the cross-section written by screener.py, or None if there is none yet
+    path = os.path.join(panel_dir, CROSS_SECTION)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+@dataclass(frozen=True)
+class CrossSection:
+    # the metrics of many companies as one contiguous (tickers x metrics x years) array plus its labels,
+    # a missing value (a year a company did not report) is NaN
+    tickers: pd.Index
+    metrics: pd.Index
+    years: pd.Index
+    values: np.ndarray
+
+    def company(self, frame: pd.DataFrame) -> np.ndarray:
+        # the (metrics x years) values of one company's metric frame, aligned to the cross-section
+        return frame.reindex(index=self.years, columns=self.metrics).to_numpy(dtype=np.float64).T
+
+    def positions(self, tickers: List[str]) -> np.ndarray:
+        # the positions of the tickers that are in the cross-section
+        positions = self.tickers.get_indexer(tickers)
+        return positions[positions >= 0]
+
+
+def to_cube(cross_section: pd.DataFrame) -> CrossSection:
+    # lay the rows out as a (tickers x metrics x years) array in a single reshape
+    tickers = cross_section.index.get_level_values('ticker').unique()
+    years = pd.Index(np.sort(cross_section.index.get_level_values('year').unique()), name='year')
+    metrics = cross_section.columns
+    full = pd.MultiIndex.from_product([tickers, years], names=['ticker', 'year'])
+    values = cross_section.reindex(full).to_numpy(dtype=np.float64)
+    values = values.reshape(len(tickers), len(years), len(metrics)).transpose(0, 2, 1)
+    return CrossSection(tickers=tickers, metrics=metrics, years=years, values=np.ascontiguousarray(values))
+
+
+def select_peers(companies: pd.DataFrame, ticker: str, sector: Optional[str],
+                 industry: Optional[str]) -> Tuple[List[str], str]:
+    # the tickers of the same industry (or sector, if the industry is too small) and which of the two they share
+    others = companies[companies.index != ticker]
+    peers = others.index[others['industry'] == industry]
+    if len(peers) >= MIN_PEERS:
+        return list(peers), 'industry'
+    return list(others.index[others['sector'] == sector]), 'sector'
+
+
+def nan_quantiles(values: np.ndarray, quantiles: List[float]) -> np.ndarray:
+    # the quantiles over the first axis ignoring NaN, with linear interpolation like np.nanpercentile,
+    # but with a single sort instead of a loop over every (metric, year), the NaNs are sorted to the end
+    ordered = np.sort(values, axis=0)
+    count = (~np.isnan(values)).sum(axis=0)
+    results = []
+    for quantile in quantiles:
+        position = (count - 1) * quantile / 100
+        lower = np.clip(np.floor(position).astype(int), 0, None)
+        upper = np.clip(np.ceil(position).astype(int), 0, None)
+        low = np.take_along_axis(ordered, lower[np.newaxis], axis=0)[0]
+        high = np.take_along_axis(ordered, upper[np.newaxis], axis=0)[0]
+        results.append(np.where(count > 0, low + (high - low) * (position - lower), np.nan))
+    return np.stack(results)
+
+
+def peer_statistics(peers: np.ndarray, company: np.ndarray, metrics: pd.Index, years: pd.Index) -> pd.DataFrame:
+    # compare a company's (metrics x years) values with the (peers x metrics x years) values of its peers,
+    # every statistic is computed for all metrics and years at once, ignoring the years a peer did not report
+    reported = ~np.isnan(peers)
+    count = reported.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # a metric no peer reported in a year has no statistics (NaN)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        quantiles = nan_quantiles(peers, list(QUANTILES.values()))
+        mean = np.nanmean(peers, axis=0)
+        std = np.nanstd(peers, axis=0, ddof=1)
+        zscore = (company - mean) / std
+        # the share of peers below the company, ties count half
+        below = (peers < company).sum(axis=0) + 0.5 * (peers == company).sum(axis=0)
+        percentile = np.where(count > 0, 100 * below / count, np.nan)
+    percentile[np.isnan(company)] = np.nan
+    zscore[~np.isfinite(zscore)] = np.nan
+    columns = {'company': company, 'peers': count, **dict(zip(QUANTILES, quantiles)),
+               'mean': mean, 'std': std, 'zscore': zscore, 'percentile': percentile}
+    index = pd.MultiIndex.from_product([metrics, years], names=['metric', 'year'])
+    return pd.DataFrame({name: np.ravel(values) for name, values in columns.items()}, index=index)
@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from .gateway import background
+
+
+# a few threads are enough, the upstream calls are limited by the gateway anyway
+PREFETCH_WORKERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+# the (part, ticker) pairs that are queued or running, so reruns do not queue the same prefetch again
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def prefetch(ticker: str, fetchers: Dict[str, Callable[[str], Any]]):
+    # warm the caches behind the given fetchers in the background with low priority and return immediately,
+    # when the user opens the tab that needs the data, the fetcher answers from its cache
+    # the fetchers run without the session's script run context, a Streamlit element they create (the spinner of
+    # st.cache_data) would otherwise be added to the page while the script is rendering it, so pass the functions
+    # below Streamlit's cache
+    for part, fetcher in fetchers.items():
+        key = (part, ticker)
+        with _pending_lock:
+            if key in _pending:
+                continue
+            _pending.add(key)
+        _executor.submit(_prefetch_part, key, fetcher, ticker)
+
+
+def _prefetch_part(key: tuple, fetcher: Callable[[str], Any], ticker: str):
+    try:
+        with background():
+            fetcher(ticker)
+    except Exception:
+        # nothing is cached, the tab fetches the data again and shows the error when it is opened
+        pass
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+
+def pending() -> int:
+    # the number of prefetches that are queued or running
+    with _pending_lock:
+        return len(_pending)
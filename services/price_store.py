@@ -0,0 +1,182 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .disk_cache import CACHE_DIR, STALE_WHILE_REVALIDATE, TTL, freshness, revalidate
+from .metrics import count
+
+
+# the price series are kept next to the persistent cache
+PRICE_DIR = os.path.join(CACHE_DIR, 'prices')
+# the columns of an adjusted price series, each one is stored in its own .npy file
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'adjusted close', 'volume', 'dividend amount', 'split coefficient']
+# how long a stored series is used before asking Alpha Vantage for newer bars
+INTERVAL_TTL = {'weekly': TTL['prices'], 'daily': TTL['daily_prices']}
+# the data type of each interval in the persistent cache
+INTERVAL_KIND = {'weekly': 'prices', 'daily': 'daily_prices'}
+# Alpha Vantage can return only the latest 100 bars of a daily series (outputsize=compact),
+# weekly series always come with the full history
+INCREMENTAL_INTERVALS = {'daily'}
+
+# a fetch function takes the ticker, the interval and whether the full history is needed,
+# and returns the bars with the PRICE_COLUMNS and a DatetimeIndex
+Fetch = Callable[[str, str, bool], pd.DataFrame]
+
+
+class PriceStore:
+    # keeps the full adjusted price history of every ticker on disk as memory-mapped columnar arrays
+    # read the docs https://numpy.org/doc/stable/reference/generated/numpy.load.html
+    #
+    # every write goes to a new generation directory and meta.json is switched to it in one atomic rename,
+    # so readers in other processes never see a half written series:
+    #   <root>/<interval>/<ticker>/meta.json
+    #   <root>/<interval>/<ticker>/<generation>/date.npy, open.npy, ...
+
+    def __init__(self, root: str = PRICE_DIR):
+        self.root = root
+        # one lock per series, so two sessions of this process do not refresh the same ticker twice
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _series_dir(self, ticker: str, interval: str) -> str:
+        return os.path.join(self.root, interval, ticker)
+
+    def _lock(self, ticker: str, interval: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault((ticker, interval), threading.Lock())
+
+    def _meta(self, ticker: str, interval: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._series_dir(ticker, interval), 'meta.json')) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def load(self, ticker: str, interval: str = 'weekly') -> Optional[pd.DataFrame]:
+        # return the stored series in ascending date order, or None if there is none
+        meta = self._meta(ticker, interval)
+        if meta is None:
+            return None
+        generation = os.path.join(self._series_dir(ticker, interval), meta['generation'])
+        try:
+            dates = np.load(os.path.join(generation, 'date.npy'), mmap_mode='r')
+            columns = {column: np.load(os.path.join(generation, f'{column}.npy'), mmap_mode='r')
+                       for column in PRICE_COLUMNS}
+        except FileNotFoundError:
+            # another process replaced the generation while we were reading it
+            return None
+        return pd.DataFrame(columns, index=pd.DatetimeIndex(dates, name='date'))
+
+    def save(self, ticker: str, interval: str, prices: pd.DataFrame):
+        series_dir = self._series_dir(ticker, interval)
+        old = self._meta(ticker, interval)
+        generation = uuid.uuid4().hex
+        os.makedirs(os.path.join(series_dir, generation))
+        np.save(os.path.join(series_dir, generation, 'date.npy'), prices.index.to_numpy(dtype='datetime64[ns]'))
+        for column in PRICE_COLUMNS:
+            np.save(os.path.join(series_dir, generation, f'{column}.npy'),
+                    np.ascontiguousarray(prices[column].to_numpy(dtype=np.float64)))
+        meta_path = os.path.join(series_dir, 'meta.json')
+        with open(meta_path + '.tmp', 'w') as file:
+            json.dump({'generation': generation, 'updated': time.time(),
+                       'last_date': str(prices.index[-1].date())}, file)
+        os.replace(meta_path + '.tmp', meta_path)
+        # readers that still have the old arrays memory-mapped keep them until they let go
+        if old is not None:
+            shutil.rmtree(os.path.join(series_dir, old['generation']), ignore_errors=True)
+
+    def age(self, ticker: str, interval: str) -> Optional[float]:
+        # the seconds since the stored series was last updated, or None if there is none
+        meta = self._meta(ticker, interval)
+        return None if meta is None else time.time() - meta['updated']
+
+    def is_fresh(self, ticker: str, interval: str) -> bool:
+        age = self.age(ticker, interval)
+        return age is not None and age < freshness(INTERVAL_TTL[interval])[0].total_seconds()
+
+    def prices(self, ticker: str, interval: str, fetch: Fetch) -> pd.DataFrame:
+        # return the price series of a ticker, fetching only the bars that are newer than the stored ones
+        # a series past its ttl is still returned at once while the new bars are fetched in the background
+        age = self.age(ticker, interval)
+        ttl, stale = freshness(INTERVAL_TTL[interval])
+        if stale is None:
+            stale = STALE_WHILE_REVALIDATE[INTERVAL_KIND[interval]]
+        if age is not None and age < (ttl + stale).total_seconds():
+            stored = self.load(ticker, interval)
+            if stored is not None and age < ttl.total_seconds():
+                count('cache_requests', cache='prices', function=interval, result='hit')
+                return stored
+            if stored is not None:
+                count('cache_requests', cache='prices', function=interval, result='stale')
+                revalidate(f'prices/{interval}/{ticker}', INTERVAL_KIND[interval],
+                           lambda: self.refresh_stale(ticker, interval, fetch))
+                return stored
+        with self._lock(ticker, interval):
+            # another session may have refreshed the series while we were waiting for the lock
+            if self.is_fresh(ticker, interval):
+                stored = self.load(ticker, interval)
+                if stored is not None:
+                    count('cache_requests', cache='prices', function=interval, result='hit')
+                    return stored
+            count('cache_requests', cache='prices', function=interval, result='miss')
+            return self.refresh(ticker, interval, fetch)
+
+    def refresh_stale(self, ticker: str, interval: str, fetch: Fetch):
+        # fetch the new bars of a stale series, unless a session of this process already did
+        with self._lock(ticker, interval):
+            if not self.is_fresh(ticker, interval):
+                self.refresh(ticker, interval, fetch)
+
+    def refresh(self, ticker: str, interval: str, fetch: Fetch) -> pd.DataFrame:
+        stored = self.load(ticker, interval)
+        full = stored is None or interval not in INCREMENTAL_INTERVALS
+        fetched = fetch(ticker, interval, full).sort_index()
+        merged = None if stored is None else merge_prices(stored, fetched)
+        if merged is None:
+            # there is no stored series yet, or a split or dividend changed the adjusted history,
+            # so the whole history is replaced (and fetched in full if the first fetch was only the latest bars)
+            merged = fetched if full else fetch(ticker, interval, True).sort_index()
+        self.save(ticker, interval, merged)
+        return self.load(ticker, interval)
+
+
+def merge_prices(stored: pd.DataFrame, fetched: pd.DataFrame) -> Optional[pd.DataFrame]:
+    # append the fetched bars to the stored series, or return None if the stored history has to be replaced
+    last_date = stored.index[-1]
+    # the fetched bars have to reach back to the last stored bar, otherwise there is a gap
+    if fetched.index[0] > last_date:
+        return None
+    # the last stored bar can be an unfinished week or day, every bar before it has to be unchanged
+    overlap = stored.index[:-1].intersection(fetched.index)
+    if not np.allclose(stored.loc[overlap, 'adjusted close'], fetched.loc[overlap, 'adjusted close'], rtol=1e-9):
+        return None
+    # the unfinished bar is replaced by the fetched bars from its date on (the date of an unfinished week
+    # moves to the last trading day of that week)
+    new_bars = fetched[fetched.index >= last_date]
+    events = new_bars[['dividend amount', 'split coefficient']]
+    known = stored[['dividend amount', 'split coefficient']].reindex(new_bars.index).fillna({'dividend amount': 0,
+                                                                                            'split coefficient': 1})
+    # a new dividend or split changes the adjusted close of every earlier bar
+    if (events != known).any(axis=None):
+        return None
+    return pd.concat([stored[stored.index < last_date], new_bars[PRICE_COLUMNS]])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store() -> PriceStore:
+    # one price store per process
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceStore()
+    return _store
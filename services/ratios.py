@@ -0,0 +1,157 @@
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .metrics import count, span
+
+
+# the standard ratio set, every formula is an expression over Alpha Vantage line items
+# and is evaluated for all fiscal years (and all tickers) at once
+# read the docs https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.eval.html
+STANDARD_RATIOS = {'grossMargin': 'grossProfit / totalRevenue',
+                   'operatingMargin': 'operatingIncome / totalRevenue',
+                   'netMargin': 'netIncome / totalRevenue',
+                   'returnOnEquity': 'netIncome / totalShareholderEquity',
+                   'returnOnAssets': 'netIncome / totalAssets',
+                   'currentRatio': 'totalCurrentAssets / totalCurrentLiabilities',
+                   'quickRatio': '(totalCurrentAssets - inventory) / totalCurrentLiabilities',
+                   'debtToEquity': 'totalLiabilities / totalShareholderEquity',
+                   'freeCashFlow': 'operatingCashflow - capitalExpenditures',
+                   'freeCashFlowMargin': '(operatingCashflow - capitalExpenditures) / totalRevenue'}
+# the line items whose year over year growth is part of the standard set
+GROWTH_ITEMS = ['totalRevenue', 'netIncome', 'operatingCashflow', 'freeCashFlow']
+# the order in which statements are combined, a line item reported in more than one statement
+# (netIncome is in the income statement and the cash flow) is taken from the first one
+STATEMENT_ORDER = ['income_statement', 'balance_sheet', 'cash_flow']
+
+# the only operators a formula can use, anything else (attribute access, calls, @ references to python objects, ...)
+# is refused before pandas sees the formula, so a custom ratio can not run code on the server
+# read the docs https://docs.python.org/3/library/ast.html
+OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.UAdd, ast.USub)
+
+# memoized results, keyed by a content hash of the input statements and the formulas
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+MEMO_ENTRIES = 256
+
+
+def observations(statements: Dict[str, Dict[str, pd.DataFrame]]) -> pd.DataFrame:
+    # combine the standardized statements ({ticker: {statement: frame}}, line items as rows, fiscal dates as columns)
+    # into one frame with a row per (ticker, fiscal date) and a column per line item
+    frames = []
+    for ticker, by_statement in statements.items():
+        parts = [by_statement[name].transpose() for name in STATEMENT_ORDER if name in by_statement]
+        combined = pd.concat(parts, axis=1, join='outer')
+        combined = combined.loc[:, ~combined.columns.duplicated()]
+        combined.index = pd.MultiIndex.from_product([[ticker], combined.index], names=['ticker', 'fiscal_date'])
+        frames.append(combined)
+    return pd.concat(frames).sort_index()
+
+
+def panel_observations(panel: pd.DataFrame) -> pd.DataFrame:
+    # the same frame for a whole statements panel (see services.panel), built with a single pivot
+    rows = panel.reset_index()
+    order = {name: position for position, name in enumerate(STATEMENT_ORDER)}
+    rows = rows.assign(order=rows['statement'].map(order)).sort_values('order', kind='mergesort')
+    rows = rows.drop_duplicates(['ticker', 'fiscal_date', 'line_item'])
+    wide = rows.pivot(index=['ticker', 'fiscal_date'], columns='line_item', values='value')
+    wide.columns.name = None
+    return wide.sort_index()
+
+
+def check_formula(formula: str, names: Iterable[str]):
+    # raise a ValueError unless the formula is arithmetic (+ - * / **) over numbers and the given names
+    try:
+        tree = ast.parse(formula, mode='eval')
+    except SyntaxError as error:
+        raise ValueError(f'invalid formula: {error.msg}') from None
+    names = set(names)
+    for node in ast.walk(tree.body):
+        if isinstance(node, (ast.BinOp, ast.UnaryOp)):
+            if not isinstance(node.op, OPERATORS):
+                raise ValueError(f'operator {type(node.op).__name__} is not allowed')
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f'only numbers are allowed, not {node.value!r}')
+        elif isinstance(node, ast.Name):
+            if node.id not in names:
+                raise ValueError(f'unknown line item or ratio {node.id!r}')
+        elif not isinstance(node, (ast.Load, *OPERATORS)):
+            raise ValueError(f'{type(node).__name__} is not allowed in a formula')
+
+
+def compute_ratios(data: pd.DataFrame, formulas: Optional[Dict[str, str]] = None,
+                   growth: Optional[List[str]] = None) -> pd.DataFrame:
+    # evaluate the formulas and the year over year growth for every (ticker, fiscal date) row at once
+    formulas = STANDARD_RATIOS if formulas is None else formulas
+    growth = GROWTH_ITEMS if growth is None else growth
+    ratios = pd.DataFrame(index=data.index)
+    # the formulas that could not be evaluated, for example because a company does not report a line item
+    errors = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, formula in formulas.items():
+            # a formula can use the line items and the ratios defined before it, and nothing from this module
+            try:
+                check_formula(formula, [*data.columns, *ratios.columns])
+                ratios[name] = data.eval(formula, resolvers=[ratios], local_dict={}, global_dict={})
+            except Exception as error:
+                ratios[name] = np.nan
+                errors[name] = str(error)
+    # growth is compared to the previous fiscal year of the same ticker
+    for item in growth:
+        source = ratios if item in ratios else data if item in data else None
+        if source is not None:
+            ratios[f'{item}Growth'] = source[item].groupby(level='ticker').pct_change()
+    # a division by zero has no meaningful ratio
+    ratios = ratios.replace([np.inf, -np.inf], np.nan)
+    ratios.attrs['errors'] = errors
+    return ratios
+
+
+def content_hash(statements: Dict[str, Dict[str, pd.DataFrame]], formulas: Dict[str, str]) -> str:
+    # hash the values and labels of the input statements, so identical statements map to the same result
+    digest = hashlib.sha1(repr(sorted(formulas.items())).encode())
+    for ticker in sorted(statements):
+        for name in sorted(statements[ticker]):
+            frame = statements[ticker][name]
+            digest.update(repr((ticker, name, list(frame.index), list(frame.columns))).encode())
+            digest.update(np.ascontiguousarray(frame.to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def ratio_table(statements: Dict[str, Dict[str, pd.DataFrame]],
+                formulas: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    # memoized ratios of one or many tickers, a warm rerun only pays for hashing the statements
+    formulas = {**STANDARD_RATIOS, **(formulas or {})}
+    key = content_hash(statements, formulas)
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            count('cache_requests', cache='ratios', function='ratio_table', result='hit')
+            return _memo[key]
+    count('cache_requests', cache='ratios', function='ratio_table', result='miss')
+    with span('compute_ratios'):
+        ratios = compute_ratios(observations(statements), formulas)
+    with _memo_lock:
+        _memo[key] = ratios
+        while len(_memo) > MEMO_ENTRIES:
+            _memo.popitem(last=False)
+            count('cache_evictions', cache='ratios')
+    return ratios
+
+
+def parse_formulas(text: str) -> Dict[str, str]:
+    # read user-defined formulas, one "name = expression" per line
+    formulas = {}
+    for line in text.splitlines():
+        if '=' not in line:
+            continue
+        name, formula = line.split('=', 1)
+        if name.strip() and formula.strip():
+            formulas[name.strip()] = formula.strip()
+    return formulas
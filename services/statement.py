@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# the columns of an Alpha Vantage statement that are not line items
+META_COLUMNS = ['fiscalDateEnding', 'reportedCurrency']
+# statements are shown in millions
+SCALE = 1_000_000
+
+
+@dataclass(frozen=True)
+class Statement:
+    # a compact financial statement shared by the balance sheet, income statement and cash flow:
+    # one contiguous (line items x fiscal dates) array of values plus its labels and the reported currency
+    line_items: pd.Index
+    fiscal_dates: pd.Index
+    values: np.ndarray
+    currency: str
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        # a DataFrame view on the values, with the line items as rows and the fiscal dates as columns
+        return pd.DataFrame(self.values, index=self.line_items, columns=self.fiscal_dates, copy=False)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+
+def parse_statement(raw: pd.DataFrame, dtype: type = np.float64) -> Statement:
+    # parse the statement returned by Alpha Vantage (one row of strings per fiscal year) into a Statement
+    # in a single vectorized pass, read the docs https://pandas.pydata.org/docs/reference/api/pandas.to_numeric.html
+    line_items = raw.columns.drop(META_COLUMNS)
+    fiscal_dates = pd.Index(raw['fiscalDateEnding'].to_numpy(), name='fiscalDateEnding')
+    # the reported currency is the same for every fiscal year
+    currency = raw['reportedCurrency'].iloc[0]
+
+    # lay the strings out line item by line item, so the parsed values are already in the shape of the statement
+    text = raw[line_items].to_numpy(dtype=object).T.ravel()
+    # 'None' is how Alpha Vantage reports a missing value, it is parsed as NaN and then replaced with 0
+    values = pd.to_numeric(text, errors='coerce').astype(dtype, copy=False)
+    values = values.reshape(len(line_items), len(fiscal_dates))
+    np.nan_to_num(values, copy=False)
+    # convert the values to millions in place
+    values /= SCALE
+    return Statement(line_items=line_items, fiscal_dates=fiscal_dates, values=values, currency=currency)
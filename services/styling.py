@@ -0,0 +1,132 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.io.formats.style import Styler
+
+from .metrics import count, span
+
+
+# the number of styled tables kept in memory, a few per ticker and statement
+RENDER_ENTRIES = 64
+# the relative luminance under which a background gets light text, the same threshold pandas uses
+# read the docs https://pandas.pydata.org/docs/reference/api/pandas.io.formats.style.Styler.background_gradient.html
+TEXT_COLOR_THRESHOLD = 0.408
+# the colors at both ends of seaborn's light_palette('seagreen', as_cmap=True), the palette of the statement tables,
+# the colormap is a straight line between them, so the app needs neither seaborn nor matplotlib to build it
+# read the docs https://seaborn.pydata.org/generated/seaborn.light_palette.html
+LIGHT_SEAGREEN = ((0.921460863132993, 0.9512120106378944, 0.9302557793948234), (46 / 255, 139 / 255, 87 / 255))
+# the number of colors of a matplotlib colormap
+PALETTE_COLORS = 256
+
+_rendered = OrderedDict()
+_rendered_lock = threading.Lock()
+
+
+def palette_css(colors: np.ndarray, text_color_threshold: float = TEXT_COLOR_THRESHOLD) -> np.ndarray:
+    # turn a palette of n rgba colors with values between 0 and 1 into the n css declarations of a gradient cell,
+    # the palette is a lookup table like the one behind a matplotlib colormap
+    rgb = np.asarray(colors, dtype=np.float64)[:, :3]
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    luminance = linear @ np.array([0.2126, 0.7152, 0.0722])
+    channels = np.round(rgb * 255).astype(int)
+    return np.array([f'background-color: #{r:02x}{g:02x}{b:02x};color: {"#f1f1f1" if dark else "#000000"};'
+                     for (r, g, b), dark in zip(channels, luminance < text_color_threshold)], dtype=object)
+
+
+def linear_palette(start: Tuple[float, float, float], end: Tuple[float, float, float],
+                   n_colors: int = PALETTE_COLORS) -> np.ndarray:
+    # the n rgba colors of a palette that blends linearly from start to end, like a two color matplotlib colormap
+    steps = np.linspace(0, 1, n_colors)[:, np.newaxis]
+    rgb = np.asarray(start) + steps * (np.asarray(end) - np.asarray(start))
+    return np.hstack([rgb, np.ones((n_colors, 1))])
+
+
+@lru_cache(maxsize=None)
+def gradient_palette(start: Tuple[float, float, float] = LIGHT_SEAGREEN[0],
+                     end: Tuple[float, float, float] = LIGHT_SEAGREEN[1]) -> np.ndarray:
+    # the css of every color of a linear palette, computed once per process instead of on every rerun of the script
+    return palette_css(linear_palette(start, end))
+
+
+def gradient_css(values: np.ndarray, css: np.ndarray) -> np.ndarray:
+    # pick the css of every cell from the palette by the position of its value between the minimum and the maximum
+    # of its column, like Styler.background_gradient does, but for all cells at once
+    values = np.asarray(values, dtype=np.float64)
+    low = np.nanmin(values, axis=0)
+    span = np.nanmax(values, axis=0) - low
+    # a constant column gets the first color of the palette
+    norm = np.divide(values - low, span, out=np.zeros_like(values), where=span > 0)
+    index = np.clip((np.nan_to_num(norm) * len(css)).astype(int), 0, len(css) - 1)
+    styles = css[index]
+    # a missing value is not colored
+    styles[np.isnan(values)] = ''
+    return styles
+
+
+def background_gradient(styler: Styler, css: np.ndarray) -> Styler:
+    # a vectorized replacement for styler.background_gradient, use it with styler.pipe(background_gradient, css)
+    styles = pd.DataFrame(gradient_css(styler.data.to_numpy(), css),
+                          index=styler.data.index, columns=styler.data.columns)
+    return styler.apply(lambda _: styles, axis=None)
+
+
+def render_once(styler: Styler) -> Styler:
+    # make a styler compute its styles and translate them to cells only once, Streamlit calls both on every rerun,
+    # so a cached table is not styled again when the page reruns
+    # the methods are replaced on the instance, because Streamlit only renders objects whose type is exactly Styler
+    lock = threading.Lock()
+    compute, translate = styler._compute, styler._translate
+    computed, translated = [], {}
+
+    def _compute():
+        with lock:
+            if not computed:
+                with span('styler.compute'):
+                    compute()
+                computed.append(True)
+        return styler
+
+    def _translate(*args, **kwargs):
+        key = repr((args, sorted(kwargs.items())))
+        with lock:
+            if key not in translated:
+                with span('styler.translate'):
+                    translated[key] = translate(*args, **kwargs)
+            return translated[key]
+
+    styler._compute, styler._translate = _compute, _translate
+    return styler
+
+
+def frame_hash(frame: pd.DataFrame) -> str:
+    # hash the values and labels of a numeric frame, so identical statements map to the same table
+    digest = hashlib.sha1(repr((list(frame.index), list(frame.columns))).encode())
+    digest.update(np.ascontiguousarray(frame.to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def styled_table(frame: pd.DataFrame, formatter: Callable[[Styler], Styler], theme: Optional[str] = None) -> Styler:
+    # return the frame styled by the formatter (a function for styler.pipe), memoized by the content of the frame,
+    # the formatter and the theme, so a rerun that does not change the table only pays for hashing it
+    content = frame_hash(frame)
+    key = (content, f'{formatter.__module__}.{formatter.__qualname__}', theme)
+    with _rendered_lock:
+        if key in _rendered:
+            _rendered.move_to_end(key)
+            count('cache_requests', cache='styled_table', function=key[1], result='hit')
+            return _rendered[key]
+    count('cache_requests', cache='styled_table', function=key[1], result='miss')
+    # a uuid from the content keeps the css of the table stable across reruns
+    with span('styled_table'):
+        styler = render_once(Styler(frame, uuid=content[:10]).pipe(formatter))
+    with _rendered_lock:
+        _rendered[key] = styler
+        while len(_rendered) > RENDER_ENTRIES:
+            _rendered.popitem(last=False)
+            count('cache_evictions', cache='styled_table')
+    return styler
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Protocol
+
+from .disk_cache import get_cache, make_key, TTL
+from .metrics import count
+
+
+# bump the prompt version whenever the prompt changes, so summaries made with the old prompt are not reused
+PROMPT_VERSION = 1
+# the backend that writes the summaries, 'openai' or 'extractive' (a local stand-in that needs no API key)
+SUMMARY_BACKEND = os.environ.get('STOCK_ANALYSIS_SUMMARY_BACKEND', 'openai')
+# the number of summaries written at the same time in batch mode
+MAX_CONCURRENT_SUMMARIES = int(os.environ.get('STOCK_ANALYSIS_SUMMARY_CONCURRENCY', 4))
+
+
+class SummaryBackend(Protocol):
+    # a model client that streams the completion of a chat prompt piece by piece
+    def stream(self, messages: List[dict]) -> Iterator[str]:
+        ...
+
+
+class OpenAIBackend:
+    # streams the completion from OpenAI's chat models
+    # read the docs https://platform.openai.com/docs/api-reference/chat/create
+
+    def __init__(self, api_key: str, model: str = 'gpt-3.5-turbo'):
+        self.api_key = api_key
+        self.model = model
+
+    def stream(self, messages: List[dict]) -> Iterator[str]:
+        # the openai library is only needed when this backend is used
+        import openai
+        response = openai.ChatCompletion.create(model=self.model, messages=messages, stream=True,
+                                                api_key=self.api_key)
+        for chunk in response:
+            piece = chunk['choices'][0]['delta'].get('content')
+            if piece:
+                yield piece
+
+
+class ExtractiveBackend:
+    # a local stand-in for a model, it "summarizes" by streaming the first sentences of the article word by word,
+    # which is enough to run the app and the tests without an API key
+
+    def __init__(self, sentences: int = 3):
+        self.sentences = sentences
+
+    def stream(self, messages: List[dict]) -> Iterator[str]:
+        article = messages[-1]['content']
+        sentences = re.split(r'(?<=[.!?])\s+', normalize_text(article))
+        for word in ' '.join(sentences[:self.sentences]).split(' '):
+            yield word + ' '
+
+
+def make_backend(name: str = SUMMARY_BACKEND, api_key: str = None) -> SummaryBackend:
+    if name == 'openai':
+        return OpenAIBackend(api_key=api_key)
+    if name == 'extractive':
+        return ExtractiveBackend()
+    raise ValueError(f'Unknown summary backend: {name}')
+
+
+def build_messages(text: str, ticker: str) -> List[dict]:
+    # the prompt sent to the model, change PROMPT_VERSION together with it
+    return [{"role": "user", "content": "Hello!"},
+            {"role": "user", "content": "Please summarize the news article briefly. Also highlight the parts "
+                                        f"that talk about {ticker}"},
+            {"role": "user", "content": f"{text}"}]
+
+
+def normalize_text(text: str) -> str:
+    # collapse whitespace, so the same article syndicated with different formatting gets the same key
+    return ' '.join(text.split())
+
+
+def summary_key(text: str, ticker: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode()).hexdigest()
+    return make_key('news_summary', (digest, ticker), {'prompt': PROMPT_VERSION})
+
+
+def stream_summary(text: str, ticker: str, backend: SummaryBackend) -> Iterator[str]:
+    # stream the summary of an article as it is written, a summary that was written before comes in one piece
+    cache = get_cache()
+    key = summary_key(text, ticker)
+    hit, summary = cache.get(key, ttl=TTL['summary'])
+    count('cache_requests', cache='disk', function='news_summary', result='hit' if hit else 'miss')
+    if hit:
+        yield summary
+        return
+    pieces = []
+    for piece in backend.stream(build_messages(normalize_text(text), ticker)):
+        pieces.append(piece)
+        yield piece
+    # only a complete summary is cached
+    cache.set(key, 'summary', ''.join(pieces))
+
+
+def summarize(text: str, ticker: str, backend: SummaryBackend) -> str:
+    return ''.join(stream_summary(text, ticker, backend))
+
+
+def summarize_many(texts: Dict[str, str], ticker: str, backend: SummaryBackend,
+                   max_concurrency: int = MAX_CONCURRENT_SUMMARIES) -> Dict[str, str]:
+    # summarize many articles ({name: text}) at the same time, but never more than max_concurrency at once
+    # an article whose summary fails maps to the exception instead
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {name: executor.submit(summarize, text, ticker, backend) for name, text in texts.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as error:
+                results[name] = error
+    return results
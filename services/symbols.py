@@ -0,0 +1,232 @@
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .disk_cache import CACHE_DIR, TTL
+from .gateway import background
+
+
+# the symbol index is kept next to the persistent cache
+SYMBOL_DIR = os.path.join(CACHE_DIR, 'symbols')
+# company names are indexed by their runs of three characters (trigrams)
+# read more at https://en.wikipedia.org/wiki/N-gram
+NGRAM = 3
+# the characters a normalized name is made of, everything else becomes a space
+ALPHABET = ' 0123456789abcdefghijklmnopqrstuvwxyz'
+# the share of the trigrams of a query a name needs to contain, below 1 a typo still finds the company
+MIN_SCORE = 0.6
+# the number of matches shown while typing
+SEARCH_LIMIT = 10
+# a failed download of the listing is not tried again before this many seconds
+RETRY_AFTER = 15 * 60
+# the arrays of an index, each one is stored in its own .npy file
+INDEX_ARRAYS = ['tickers', 'names', 'exchanges', 'gram_starts', 'gram_rows']
+
+# a fetch function returns the listing of all active symbols as the CSV text of Alpha Vantage's LISTING_STATUS
+Fetch = Callable[[], str]
+
+# the byte of every character of the alphabet maps to its position, any other byte maps to the space
+_codes = np.zeros(256, dtype=np.int32)
+_codes[np.frombuffer(ALPHABET.encode(), dtype=np.uint8)] = np.arange(len(ALPHABET))
+
+
+def read_tickers(path: str) -> List[str]:
+    # read a file with one ticker per line (the screener's coverage list, the warmer's watchlist), skipping blank lines,
+    # comments and duplicates, the order of the file is kept
+    with open(path) as file:
+        tickers = [line.split('#')[0].strip().upper() for line in file]
+    return list(dict.fromkeys(ticker for ticker in tickers if ticker))
+
+
+def normalize_name(name: str) -> str:
+    # lower case letters and digits separated by single spaces, with a leading space so word starts are trigrams too
+    return ' ' + ' '.join(''.join(char if char in ALPHABET else ' ' for char in name.lower()).split())
+
+
+def name_grams(name: str) -> np.ndarray:
+    # the trigrams of a normalized name, each one encoded as a number below len(ALPHABET) ** NGRAM
+    codes = _codes[np.frombuffer(name.encode('ascii', 'ignore'), dtype=np.uint8)]
+    if len(codes) < NGRAM:
+        return np.empty(0, dtype=np.int64)
+    windows = np.lib.stride_tricks.sliding_window_view(codes, NGRAM)
+    return np.unique(windows @ (len(ALPHABET) ** np.arange(NGRAM - 1, -1, -1)))
+
+
+class SymbolIndex:
+    # an in-memory (or memory-mapped) search index of every listed symbol
+    # tickers are sorted, so all tickers starting with a prefix are one binary search away,
+    # company names are found through an inverted index from trigrams to rows in compressed sparse row layout:
+    # the rows that contain trigram g are gram_rows[gram_starts[g]:gram_starts[g + 1]]
+    # read more at https://en.wikipedia.org/wiki/Sparse_matrix#Compressed_sparse_row_(CSR,_CRS_or_Yale_format)
+
+    def __init__(self, tickers: np.ndarray, names: np.ndarray, exchanges: np.ndarray,
+                 gram_starts: np.ndarray, gram_rows: np.ndarray):
+        self.tickers = tickers
+        self.names = names
+        self.exchanges = exchanges
+        self.gram_starts = gram_starts
+        self.gram_rows = gram_rows
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    @classmethod
+    def empty(cls) -> 'SymbolIndex':
+        return cls.from_frame(pd.DataFrame({'symbol': [], 'name': [], 'exchange': []}))
+
+    @classmethod
+    def from_listing(cls, listing: str) -> 'SymbolIndex':
+        # build the index from the CSV of LISTING_STATUS,
+        # read the docs https://www.alphavantage.co/documentation/#listing-status
+        frame = pd.read_csv(io.StringIO(listing), keep_default_na=False)
+        # only stocks have the statements this app shows, ETFs and warrants are left out
+        return cls.from_frame(frame[frame['assetType'] == 'Stock'])
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'SymbolIndex':
+        frame = frame.assign(symbol=frame['symbol'].astype(str).str.upper())
+        # the tickers are sorted as bytes, the order binary search expects
+        frame = frame.drop_duplicates('symbol').sort_values('symbol', kind='stable')
+        tickers = frame['symbol'].str.encode('ascii', 'ignore').to_numpy(dtype=bytes)
+        names = frame['name'].astype(str).str.encode('utf-8').to_numpy(dtype=bytes)
+        exchanges = frame['exchange'].astype(str).str.encode('ascii', 'ignore').to_numpy(dtype=bytes)
+
+        # collect the (trigram, row) pairs of all names and group the rows by trigram
+        grams = [name_grams(normalize_name(name)) for name in frame['name']]
+        rows = np.repeat(np.arange(len(grams), dtype=np.int32), [len(row_grams) for row_grams in grams])
+        grams = np.concatenate(grams) if grams else np.empty(0, dtype=np.int64)
+        order = np.argsort(grams, kind='stable')
+        gram_starts = np.zeros(len(ALPHABET) ** NGRAM + 1, dtype=np.int64)
+        np.cumsum(np.bincount(grams, minlength=len(ALPHABET) ** NGRAM), out=gram_starts[1:])
+        return cls(tickers, names, exchanges, gram_starts, rows[order])
+
+    @classmethod
+    def load(cls, directory: str = SYMBOL_DIR) -> Optional['SymbolIndex']:
+        # load the stored index memory-mapped, so every worker process shares the same pages, or None if there is none
+        meta = read_meta(directory)
+        if meta is None:
+            return None
+        generation = os.path.join(directory, meta['generation'])
+        try:
+            arrays = {name: np.load(os.path.join(generation, f'{name}.npy'), mmap_mode='r')
+                      for name in INDEX_ARRAYS}
+        except FileNotFoundError:
+            # another process replaced the generation while we were reading it
+            return None
+        return cls(**arrays)
+
+    def save(self, directory: str = SYMBOL_DIR):
+        # write a new generation and switch meta.json to it in one atomic rename, like the price store
+        old = read_meta(directory)
+        generation = uuid.uuid4().hex
+        os.makedirs(os.path.join(directory, generation))
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(directory, generation, f'{name}.npy'), getattr(self, name))
+        meta_path = os.path.join(directory, 'meta.json')
+        with open(meta_path + '.tmp', 'w') as file:
+            json.dump({'generation': generation, 'updated': time.time(), 'symbols': len(self)}, file)
+        os.replace(meta_path + '.tmp', meta_path)
+        if old is not None:
+            shutil.rmtree(os.path.join(directory, old['generation']), ignore_errors=True)
+
+    def prefix_rows(self, prefix: str) -> np.ndarray:
+        # the rows of all tickers that start with the prefix, exact match first, then the shorter tickers
+        needle = prefix.strip().upper().encode('ascii', 'ignore')
+        if not needle:
+            return np.empty(0, dtype=np.int64)
+        start = np.searchsorted(self.tickers, needle, side='left')
+        stop = np.searchsorted(self.tickers, needle + b'\xff', side='left')
+        rows = np.arange(start, stop)
+        return rows[np.argsort(np.char.str_len(self.tickers[start:stop]), kind='stable')]
+
+    def name_rows(self, query: str) -> np.ndarray:
+        # the rows of the names that contain most trigrams of the query, best and shortest names first
+        grams = name_grams(normalize_name(query))
+        if not len(grams):
+            return np.empty(0, dtype=np.int64)
+        postings = np.concatenate([self.gram_rows[self.gram_starts[gram]:self.gram_starts[gram + 1]]
+                                   for gram in grams])
+        hits = np.bincount(postings, minlength=len(self))
+        rows = np.flatnonzero(hits >= MIN_SCORE * len(grams))
+        return rows[np.lexsort((np.char.str_len(self.names[rows]), -hits[rows]))]
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[dict]:
+        # tickers that start with the query come first, then companies whose name looks like the query
+        rows = np.concatenate([self.prefix_rows(query)[:limit], self.name_rows(query)[:limit]])
+        _, first = np.unique(rows, return_index=True)
+        return [{'symbol': self.tickers[row].decode(),
+                 'name': self.names[row].decode('utf-8'),
+                 'exchange': self.exchanges[row].decode()}
+                for row in rows[np.sort(first)][:limit]]
+
+
+def read_meta(directory: str = SYMBOL_DIR) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, 'meta.json')) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+_index = None
+_index_generation = None
+_index_lock = threading.Lock()
+# whether a refresh is running and when the last one started
+_refresh_state = {'running': False, 'started': 0.0}
+
+
+def get_symbol_index() -> SymbolIndex:
+    # one index per process, loaded memory-mapped from disk the first time it is needed,
+    # the index is empty until the first listing was downloaded
+    global _index
+    with _index_lock:
+        if _index is None:
+            _reload(read_meta())
+            _index = _index or SymbolIndex.empty()
+    return _index
+
+
+def _reload(meta: Optional[dict]):
+    # swap in the stored generation, the caller holds _index_lock
+    global _index, _index_generation
+    index = SymbolIndex.load() if meta is not None else None
+    if index is not None:
+        _index, _index_generation = index, meta['generation']
+
+
+def refresh_symbol_index(fetch: Fetch):
+    # pick up an index another process saved, and download the listing again in a background thread
+    # if the stored index is older than its ttl, searches keep using the old index until the new one is swapped in
+    meta = read_meta()
+    with _index_lock:
+        if meta is not None and meta['generation'] != _index_generation:
+            _reload(meta)
+        if meta is not None and time.time() - meta['updated'] < TTL['listing'].total_seconds():
+            return
+        if _refresh_state['running'] or time.time() - _refresh_state['started'] < RETRY_AFTER:
+            return
+        _refresh_state.update(running=True, started=time.time())
+    threading.Thread(target=_refresh, args=(fetch,), name='symbols', daemon=True).start()
+
+
+def _refresh(fetch: Fetch):
+    try:
+        with background():
+            listing = fetch()
+        SymbolIndex.from_listing(listing).save()
+        with _index_lock:
+            _reload(read_meta())
+    except Exception:
+        # the old index (or the default tickers) stays in use, the next run after RETRY_AFTER tries again
+        pass
+    finally:
+        with _index_lock:
+            _refresh_state['running'] = False
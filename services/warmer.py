@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .disk_cache import TTL, get_cache, make_key, max_age
+from .gateway import ThrottledError, background
+from .metrics import count, span
+from .symbols import read_tickers
+
+
+# the file with the tickers the app keeps warm in its own process, one per line in priority order,
+# leave it unset when a separate worker runs warmer.py
+WATCHLIST = os.environ.get('STOCK_ANALYSIS_WATCHLIST')
+
+# how often each part of a watchlist ticker is fetched again, by default the ttl of its data in the persistent cache,
+# the parts are refreshed in this order for every ticker
+CADENCE = {'overview': TTL['overview'],
+           'statements': TTL['statement'],
+           'weekly_prices': TTL['prices'],
+           'news': TTL['news']}
+# a part is fetched again once it is this share of its cadence old, before users see it expire
+REFRESH_AT = 0.8
+# the time from the start of one sweep over the watchlist to the next, a sweep only calls the API for parts that are due
+SWEEP_INTERVAL = timedelta(minutes=5)
+# how long the warmer waits after Alpha Vantage throttled one of its calls
+THROTTLE_PAUSE = timedelta(minutes=1)
+# when the overview shows that a fiscal year closed, the annual statements are checked daily for this long,
+# companies file their annual report within about two months and Alpha Vantage picks it up soon after
+EARNINGS_WINDOW = timedelta(days=75)
+EARNINGS_CADENCE = timedelta(days=1)
+
+# returns the latest reported quarter (2023-06-30) and the month the fiscal year ends (September) of a ticker
+FiscalCalendar = Callable[[str], Tuple[Optional[str], Optional[str]]]
+
+
+def closes_fiscal_year(latest_quarter: Optional[str], fiscal_year_end: Optional[str]) -> bool:
+    # whether the latest reported quarter is the last quarter of the fiscal year, so a new annual report is coming
+    try:
+        return datetime.strptime(latest_quarter, '%Y-%m-%d').strftime('%B') == fiscal_year_end
+    except (TypeError, ValueError):
+        return False
+
+
+class Warmer:
+    # keeps the data of a watchlist fresh in the persistent cache, so users of the app always get an instant answer
+    #
+    # every sweep walks the watchlist in priority order and calls the fetch function of each part inside a max_age
+    # block, a part younger than its cadence is read from the cache without calling the API, an older one is fetched
+    # again with background priority, so the gateway serves users first and keeps the calls within the quota
+
+    def __init__(self, tickers: List[str], fetchers: Dict[str, Callable[[str], Any]],
+                 fiscal_calendar: Optional[FiscalCalendar] = None,
+                 cadence: Optional[Dict[str, timedelta]] = None,
+                 sweep_interval: timedelta = SWEEP_INTERVAL):
+        self.tickers = tickers
+        self.fetchers = fetchers
+        self.fiscal_calendar = fiscal_calendar
+        self.cadence = dict(CADENCE, **(cadence or {}))
+        self.sweep_interval = sweep_interval
+        self.stop_event = threading.Event()
+
+    def reporting(self, ticker: str) -> bool:
+        # whether the ticker closed a fiscal year recently and its new annual statements may not be fetched yet
+        hit, state = get_cache().get(make_key('warmer_fiscal_calendar', (ticker,), {}))
+        return hit and state['closed'] is not None and time.time() - state['closed'] < EARNINGS_WINDOW.total_seconds()
+
+    def check_earnings(self, ticker: str):
+        # compare the latest quarter of the overview with the one seen before, a new quarter that ends the fiscal year
+        # starts the earnings window of the statements
+        latest_quarter, fiscal_year_end = self.fiscal_calendar(ticker)
+        cache = get_cache()
+        key = make_key('warmer_fiscal_calendar', (ticker,), {})
+        hit, state = cache.get(key)
+        if hit and state['latest_quarter'] == latest_quarter:
+            return
+        # the first time a ticker is seen, its statements follow their usual cadence
+        closed = state['closed'] if hit else None
+        if hit and closes_fiscal_year(latest_quarter, fiscal_year_end):
+            closed = time.time()
+        cache.set(key, 'schedule', {'latest_quarter': latest_quarter, 'closed': closed})
+
+    def max_age(self, ticker: str, part: str) -> timedelta:
+        age = self.cadence[part] * REFRESH_AT
+        if part == 'statements' and self.fiscal_calendar is not None and self.reporting(ticker):
+            age = min(age, EARNINGS_CADENCE)
+        return age
+
+    def refresh(self, ticker: str, part: str) -> str:
+        # fetch one part of a ticker if it is due, and return 'ok', 'throttled' or 'error'
+        try:
+            with background(), max_age(self.max_age(ticker, part)):
+                self.fetchers[part](ticker)
+                if part == 'overview' and self.fiscal_calendar is not None:
+                    self.check_earnings(ticker)
+        except ThrottledError:
+            # the gateway has already emptied its token bucket, wait a bit more before the next part
+            result = 'throttled'
+            self.stop_event.wait(THROTTLE_PAUSE.total_seconds())
+        except Exception:
+            # the part is tried again in the next sweep, until then users get the cached copy (if any)
+            result = 'error'
+        else:
+            result = 'ok'
+        count('warmer_refreshes', part=part, result=result)
+        return result
+
+    def sweep(self) -> Dict[Tuple[str, str], str]:
+        # one pass over the watchlist, returns the result of every (ticker, part)
+        results = {}
+        with span('warmer.sweep'):
+            for ticker in self.tickers:
+                for part in self.fetchers:
+                    if self.stop_event.is_set():
+                        return results
+                    results[ticker, part] = self.refresh(ticker, part)
+        return results
+
+    def run(self, once: bool = False, report: Optional[Callable[[Dict[Tuple[str, str], str]], None]] = None):
+        # sweep the watchlist every sweep interval until stop() is called
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            results = self.sweep()
+            if report is not None:
+                report(results)
+            if once:
+                return
+            self.stop_event.wait(max(self.sweep_interval.total_seconds() - (time.monotonic() - started), 0))
+
+    def stop(self):
+        self.stop_event.set()
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_warmer(fetchers: Dict[str, Callable[[str], Any]], fiscal_calendar: Optional[FiscalCalendar] = None,
+                 path: Optional[str] = WATCHLIST) -> Optional[Warmer]:
+    # keep the watchlist warm in a background thread of this process, once per process,
+    # nothing is started unless a watchlist is configured
+    global _warmer
+    if not path:
+        return None
+    with _warmer_lock:
+        if _warmer is None:
+            # the order of the watchlist is the priority
+            _warmer = Warmer(read_tickers(path), fetchers, fiscal_calendar)
+            threading.Thread(target=_warmer.run, name='warmer', daemon=True).start()
+    return _warmer
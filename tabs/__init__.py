@@ -4,18 +4,48 @@ __all__ = ['company_info',
            'company_balance_sheet',
            'company_income_statement',
            'company_cash_flow',
+           'company_ratios',
            'company_news',
-           'company_price_chart']
+           'company_price_chart',
+           'company_peers',
+           'admin_metrics',
+           'get_news',
+           'stored_weekly_prices',
+           'weekly_prices']
 
-# Import the function 'company_info' from the 'company_info_tab' module
-from .company_info_tab import company_info
-# Import the function 'company_balance_sheet' from the 'company_balancesheet' module
-from .company_balancesheet import company_balance_sheet
-# Import the function 'company_income_statement' from the 'company_income_statement' module
-from .company_income_statement import company_income_statement
-# Import the function 'company_cash_flow' from the 'company_cashflow' module
-from .company_cashflow import company_cash_flow
-# Import the function 'company_news' from the 'company_news' module
-from .company_news import company_news
-# Import the function 'company_price_chart' from the 'company_price_chart' module
-from .company_price_chart import company_price_chart
+import importlib
+
+# The module each public object is defined in, a module is only imported the first time one of its objects is used,
+# so starting the app does not load the libraries of tabs nobody opened
+# read more at https://peps.python.org/pep-0562/
+_modules = {'company_info': 'company_info_tab',
+            'company_balance_sheet': 'company_balancesheet',
+            'company_income_statement': 'company_income_statement',
+            'company_cash_flow': 'company_cashflow',
+            'company_ratios': 'company_ratios',
+            'company_news': 'company_news',
+            'company_price_chart': 'company_price_chart',
+            'company_peers': 'company_peers',
+            'admin_metrics': 'admin_metrics',
+            # the data of the news and price chart tabs, fetched ahead of time by the app and the cache warmer
+            'get_news': 'company_news',
+            'stored_weekly_prices': 'company_price_chart',
+            'weekly_prices': 'company_price_chart'}
+
+
+def __getattr__(name: str):
+    # import the module of a public object on first use
+    if name not in _modules:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module = importlib.import_module(f'.{_modules[name]}', __name__)
+    # importing a module sets the package attribute of the same name to the module, several tab functions share the
+    # name of their module, so all objects of the module are set as attributes here and the functions win,
+    # import them from this package (from tabs import company_news), not from their modules
+    for public, module_name in _modules.items():
+        if module_name == _modules[name]:
+            globals()[public] = getattr(module, public)
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,94 @@
+import time
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+# Import the metrics of this process and their exports
+from services import metrics
+
+
+def series_frame(series: list, name: str) -> pd.DataFrame:
+    # one row per series of a metric, with a column per label
+    rows = [dict(item['labels'], **{key: value for key, value in item.items() if key not in ('labels', 'buckets')})
+            for item in series if item['name'] == name]
+    return pd.DataFrame(rows)
+
+
+def counter_table(series: list, name: str, index: list, column: Optional[str] = None) -> pd.DataFrame:
+    # a counter as a table with the index labels as rows and the values of one label (if any) as columns
+    frame = series_frame(series, name)
+    if frame.empty:
+        return frame
+    if column is None:
+        return frame.groupby(index)['value'].sum().to_frame(name)
+    return frame.pivot_table(index=index, columns=column, values='value', aggfunc='sum', fill_value=0)
+
+
+# define a function 'admin_metrics' that shows the metrics of this process on the hidden admin page
+def admin_metrics():
+    st.title('Metrics')
+    if not metrics.ENABLED:
+        st.info('Metrics are switched off. Set STOCK_ANALYSIS_METRICS=1 and restart the app to collect them.')
+        return
+
+    current = metrics.snapshot()
+    series = current['metrics']
+    st.caption(f"Process {current['pid']}, collecting for {(current['time'] - current['started']) / 60:,.0f} minutes. "
+               'Every Streamlit worker process has its own metrics.')
+
+    # the upstream calls of the last minute against the plan's quota
+    gauges = {item['name']: item['value'] for item in series if item['type'] == 'gauge'}
+    col1, col2, col3 = st.columns(3)
+    col1.metric(label='Calls in the last minute', value=f"{gauges.get('upstream_calls_last_minute', 0):,.0f}")
+    col2.metric(label='Quota per minute', value=f"{gauges.get('upstream_quota_per_minute', 0):,.0f}")
+    col3.metric(label='Calls available now', value=f"{gauges.get('upstream_tokens', 0):,.1f}")
+
+    # where the time goes, the percentiles are the upper bounds of histogram buckets
+    st.subheader('Spans')
+    spans = series_frame(series, 'span_seconds')
+    if not spans.empty:
+        spans = pd.DataFrame({'calls': spans['count'],
+                              'mean ms': spans['sum'] / spans['count'] * 1000,
+                              'p50 ms': spans['p50'] * 1000,
+                              'p95 ms': spans['p95'] * 1000,
+                              'total s': spans['sum']}).set_index(spans['span']).sort_values('total s',
+                                                                                             ascending=False)
+    st.dataframe(spans, use_container_width=True)
+
+    # how often every cache had the result
+    st.subheader('Caches')
+    caches = counter_table(series, 'cache_requests', ['cache', 'function'], 'result')
+    if not caches.empty:
+        caches = caches.reindex(columns=['hit', 'stale', 'miss'], fill_value=0)
+        # a stale entry is answered at once, so it counts as a hit
+        caches['hit rate'] = (caches['hit'] + caches['stale']) / caches.sum(axis=1)
+    st.dataframe(caches, use_container_width=True)
+    st.dataframe(counter_table(series, 'cache_evictions', ['cache']), use_container_width=True)
+    st.dataframe(counter_table(series, 'cache_revalidations', ['kind'], 'result'), use_container_width=True)
+
+    # what the cache warmer of this process checked and refreshed
+    st.subheader('Cache warmer')
+    st.dataframe(counter_table(series, 'warmer_refreshes', ['part'], 'result'), use_container_width=True)
+
+    # the calls made to the APIs and the size of their responses
+    st.subheader('Upstream')
+    st.dataframe(counter_table(series, 'upstream_calls', ['client'], 'result'), use_container_width=True)
+    st.dataframe(counter_table(series, 'upstream_coalesced', ['client']), use_container_width=True)
+    for name, label in (('upstream_payload_bytes', 'client'), ('http_payload_bytes', 'host')):
+        payloads = series_frame(series, name)
+        if not payloads.empty:
+            st.dataframe(pd.DataFrame({'responses': payloads['count'],
+                                       'mean bytes': payloads['sum'] / payloads['count'],
+                                       'total bytes': payloads['sum']}).set_index(payloads[label]),
+                         use_container_width=True)
+
+    # the same metrics for dashboards
+    col1, col2, col3 = st.columns(3)
+    col1.download_button(label='Prometheus', data=metrics.prometheus_text(series),
+                         file_name='stock_analysis.prom', mime='text/plain')
+    col2.download_button(label='JSON', data=metrics.json_line(current),
+                         file_name=f"stock_analysis-{time.strftime('%Y%m%d-%H%M%S')}.jsonl",
+                         mime='application/json')
+    if col3.button(label='Reset'):
+        metrics.get_registry().reset()
+        st.experimental_rerun()
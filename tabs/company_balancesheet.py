@@ -1,10 +1,17 @@
 import streamlit as st
 from typing import Callable
+# Import the server-side downsampling of chart data
+from services.downsample import downsample
+# Import the render cache of styled tables
+from services.styling import styled_table
+# Import the timing spans
+from services.metrics import timed
 
 
 # define a function 'company_balance_sheet' which accepts two arguments:
 # a Callable 'formatter' (likely a function to format data), and a string 'currency'
 # (the currency in which the company's financials are reported)
+@timed('company_balance_sheet')
 def company_balance_sheet(formatter: Callable, currency: str):
     # load balance sheet data into a DataFrame
     df = st.session_state.balance_sheet
@@ -23,7 +30,8 @@ def company_balance_sheet(formatter: Callable, currency: str):
 
     # if the 'View Balance Sheet' checkbox is checked, display the styled DataFrame
     if st.session_state.show_bs:
-        st.dataframe(df.style.pipe(formatter), use_container_width=True)
+        # the styled table is cached, so changing the line items below does not style it again
+        st.dataframe(styled_table(df, formatter, theme=st.get_option('theme.base')), use_container_width=True)
 
     # allow the user to select multiple line items from the balance sheet
     st.session_state.selected_bs_line = st.multiselect(
@@ -36,6 +44,7 @@ def company_balance_sheet(formatter: Callable, currency: str):
     chart_df = st.session_state.balance_sheet.transpose()
 
     # create a line chart of the selected balance sheet line items over time
-    st.line_chart(data=chart_df,
+    # only the selected line items are sent to the browser, downsampled to the width of the chart
+    st.line_chart(data=downsample(chart_df, st.session_state.selected_bs_line),
                   y=st.session_state.selected_bs_line,
                   )
\ No newline at end of file
@@ -1,6 +1,13 @@
 import streamlit as st
 from typing import Callable
-
+# Import the server-side downsampling of chart data
+from services.downsample import downsample
+# Import the render cache of styled tables
+from services.styling import styled_table
+# Import the timing spans
+from services.metrics import timed
+
+@timed('company_cash_flow')
 def company_cash_flow(formatter: Callable, currency: str):
     # load cash flow data into a DataFrame
     df = st.session_state.cash_flow
@@ -19,7 +26,8 @@ def company_cash_flow(formatter: Callable, currency: str):
 
     # if the 'View Statement of Cash Flow' checkbox is checked, display the styled DataFrame
     if st.session_state.show_cf:
-        st.dataframe(df.style.pipe(formatter), use_container_width=True)
+        # the styled table is cached, so changing the line items below does not style it again
+        st.dataframe(styled_table(df, formatter, theme=st.get_option('theme.base')), use_container_width=True)
 
     # allow the user to select a line item from the cash flow statement
     st.session_state.selected_cf_line = st.multiselect(
@@ -32,4 +40,5 @@ def company_cash_flow(formatter: Callable, currency: str):
     chart_df = st.session_state.cash_flow.transpose()
 
     # create a line chart of the selected cash flow line item over time
-    st.line_chart(data=chart_df, y=st.session_state.selected_cf_line)
\ No newline at end of file
+    # only the selected line items are sent to the browser, downsampled to the width of the chart
+    st.line_chart(data=downsample(chart_df, st.session_state.selected_cf_line), y=st.session_state.selected_cf_line)
\ No newline at end of file
@@ -1,5 +1,8 @@
 import streamlit as st
+# Import the timing spans
+from services.metrics import timed
 
+@timed('company_info')
 def company_info(company_detail: dict):
     # display a Streamlit metric widget with the company name as the label and the ticker symbol as the value
     st.metric(label=company_detail['Name'],
@@ -1,55 +1,47 @@
-import requests
-import openai
 import streamlit as st
-import yfinance as yf
-from bs4 import BeautifulSoup
+# Import the ttl of each data type (on disk and in memory) and the timing spans
+from services import cache_miss, memory_ttl, timed
+# Import the persistently cached news list and the pooled, prefetching and persistently cached article ingestion
+from services.news import PREFETCH_ARTICLES, news_items, prefetch_articles, submit_article
+# Import the streaming, cached news summarization
+from services.summarizer import SUMMARY_BACKEND, make_backend, stream_summary, summarize_many
 
 
-# use Streamlit's cache decorator to store the result of this function, so it only runs once
-@st.cache_data
+# use Streamlit's cache decorator to store the result of this function, so it only runs once per ttl
+@timed('get_news', cache='memory')
+@st.cache_data(ttl=memory_ttl('news'))
+@cache_miss
 def get_news(ticker: str):
-    # this function takes a ticker symbol as a string,
-    # fetches the corresponding financial symbol with yfinance and returns the news related to this symbol
-    symbol = yf.Ticker(ticker= ticker)
-    return symbol.get_news()
+    # this function takes a ticker symbol as a string and returns the news related to this symbol,
+    # fetched with yfinance or read from the persistent cache
+    return news_items(ticker)
 
 
-# use Streamlit's cache decorator to store the result of this function, so it only runs once
-@st.cache_data
+# use Streamlit's cache decorator to store the result of this function, so it only runs once per ttl
+@timed('get_news_text', cache='memory')
+@st.cache_data(ttl=memory_ttl('article'))
+@cache_miss
 def get_news_text(url: str):
-    # this function takes a URL as a string,
-    response = requests.get(url)
-    # makes a GET request to fetch the web page,
-    soup = BeautifulSoup(response.content, features='lxml')
-    # parses the content with BeautifulSoup, and
-    text = soup.find('div', attrs={'class': 'caas-body'}).text
-    # returns the text of the news article
-    return text
+    # this function takes a URL as a string and returns the text of the news article,
+    # the article is usually already being fetched or cached by the prefetch of the news tab
+    return submit_article(url).result()
 
 
-# use Streamlit's cache decorator to store the result of this function, so it only runs once
-@st.cache_data
-def get_news_summary(text: str, ticker: str):
-    openai.api_key = st.secrets['openai']
-    # this function takes a text string (a news article) and a ticker string, sends them to the OpenAI
-    # GPT-3.5-turbo model to generate a summary, and returns the summary text
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "user", "content": "Hello!"},
-            {"role": "user", "content": "Please summarize the news article briefly. Also highlight the parts "
-                                        f"that talk about {ticker}"
-             },
-            {"role": "user", "content": f"{text}"}
-        ]
-    )
-    return response['choices'][0]['message']['content']
+# use Streamlit's cache decorator to keep one summary backend per process
+@st.cache_resource
+def get_summary_backend():
+    # this function creates the model client that writes the summaries,
+    # set STOCK_ANALYSIS_SUMMARY_BACKEND=extractive to use the local stand-in instead of OpenAI
+    return make_backend(SUMMARY_BACKEND, api_key=st.secrets.get('openai'))
 
 
 # Define a function to display and summarize company news
+@timed('company_news')
 def company_news(ticker: str):
     # Get news related to the specified ticker
     news = get_news(ticker)
+    # Start fetching the top articles in the background, so they are ready when the user asks for a summary
+    prefetch_articles([item['link'] for item in news[:PREFETCH_ARTICLES]])
     # Set subheader for the news section
     st.subheader('I can summarize news for you!')
     # Create two columns in Streamlit interface
@@ -67,21 +59,48 @@ def company_news(ticker: str):
     # Add a button that triggers the news summary when clicked
     col2.button(label='**summarize!**', key='summarize_btn')
 
-    # If the summarize button is clicked
-    if st.session_state.summarize_btn:
-        # Get the summary of the selected news
-        st.session_state.news_summary = get_news_summary(text=st.session_state.selected_news,
-                                                         ticker=st.session_state.selected_ticker)
-        # Keep the summary expander open
-        st.session_state.expanded = True
-
     # Initialize news_summary in the session state if it doesn't exist
     if 'news_summary' not in st.session_state:
         # Keep the summary expander closed
         st.session_state.expanded = False
         st.session_state.news_summary = ''
 
+    # If the summarize button is clicked, keep the summary expander open
+    if st.session_state.summarize_btn:
+        st.session_state.expanded = True
+
     # Create an expander for displaying the news summary
     with col2.expander(label='summary', expanded=st.session_state.expanded):
-        # Display the news summary in the expander
-        st.write(st.session_state.news_summary)
+        # If the summarize button is clicked
+        if st.session_state.summarize_btn:
+            # Get the text of the selected article and stream its summary into the expander as it is written
+            text = get_news_text(st.session_state.selected_news)
+            placeholder = st.empty()
+            summary = ''
+            for piece in stream_summary(text, ticker=st.session_state.selected_ticker,
+                                        backend=get_summary_backend()):
+                summary += piece
+                placeholder.markdown(summary)
+            st.session_state.news_summary = summary
+        else:
+            # Display the news summary in the expander
+            st.write(st.session_state.news_summary)
+
+    # Add a button that summarizes all prefetched articles at once
+    if col2.button(label='summarize all top stories', key='summarize_all_btn'):
+        top_news = news[:PREFETCH_ARTICLES]
+        # wait for the prefetched articles, an article that could not be fetched is left out
+        texts = {}
+        for item, future in zip(top_news, prefetch_articles([item['link'] for item in top_news])):
+            try:
+                texts[item['title']] = future.result()
+            except Exception:
+                continue
+        # summarize them concurrently, but never more than MAX_CONCURRENT_SUMMARIES at once
+        summaries = summarize_many(texts, ticker=st.session_state.selected_ticker, backend=get_summary_backend())
+        for title, summary in summaries.items():
+            with col2.expander(label=title):
+                if isinstance(summary, Exception):
+                    st.error(f'Could not summarize this article: {summary}')
+                else:
+                    st.write(summary)
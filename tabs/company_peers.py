@@ -0,0 +1,95 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+# Import the columnar cross-section of the coverage list and the vectorized peer statistics
+from services.peers import CrossSection, metric_frame, peer_statistics, select_peers
+# Import the memoized ratio engine
+from services.ratios import observations, ratio_table
+# Import the timing spans
+from services.metrics import timed
+
+
+# the sector of the company overview (SIC divisions) and the closest sector of Alpha Vantage's sector performance
+SECTOR_NAMES = {'TECHNOLOGY': 'Information Technology',
+                'LIFE SCIENCES': 'Health Care',
+                'FINANCE': 'Financials',
+                'MANUFACTURING': 'Industrials',
+                'TRADE & SERVICES': 'Consumer Discretionary',
+                'ENERGY & TRANSPORTATION': 'Energy',
+                'REAL ESTATE & CONSTRUCTION': 'Real Estate'}
+# the periods of the sector performance shown above the comparison
+SECTOR_PERIODS = {'1 Day': 'Rank B: 1 Day Performance',
+                  '1 Month': 'Rank D: 1 Month Performance',
+                  'Year to Date': 'Rank F: Year-to-Date (YTD) Performance',
+                  '1 Year': 'Rank G: 1 Year Performance'}
+# the columns of the comparison table and their format
+COLUMNS = {'company': '{:,.2f}', 'median': '{:,.2f}', 'p25': '{:,.2f}', 'p75': '{:,.2f}',
+           'percentile': '{:.0f}', 'zscore': '{:+.2f}', 'peers': '{:.0f}'}
+
+
+def sector_metrics(sector: str, performance: Optional[dict]):
+    # show how the company's sector did over several periods, if Alpha Vantage's sector performance is available
+    name = SECTOR_NAMES.get(sector)
+    if performance is None or name is None:
+        return
+    cols = st.columns(len(SECTOR_PERIODS))
+    for col, (label, rank) in zip(cols, SECTOR_PERIODS.items()):
+        value = performance.get(rank, {}).get(name)
+        col.metric(label=f'{name} {label}', value='-' if value is None else f'{value:+.2%}')
+
+
+# define a function 'company_peers' that places the selected company next to the companies of its industry
+@timed('company_peers')
+def company_peers(company_detail: dict, cross_section: Optional[CrossSection], companies: Optional[pd.DataFrame],
+                  sector_performance: Optional[dict] = None):
+    ticker = st.session_state.selected_ticker
+    sector, industry = company_detail.get('Sector'), company_detail.get('Industry')
+    sector_metrics(sector, sector_performance)
+
+    # the peers come from the panels of screener.py, so comparing with many companies does not call the API
+    if cross_section is None or companies is None:
+        st.info('There are no peers to compare with yet. Run screener.py with a list of tickers to prepare them.')
+        return
+    peers, level = select_peers(companies, ticker, sector, industry)
+    positions = cross_section.positions(peers)
+    if len(positions) == 0:
+        st.info(f'None of the companies in the {sector.title() if sector else "same"} sector has been screened yet.')
+        return
+    st.caption(f"Compared with {len(positions)} companies of the {level} "
+               f"{(industry if level == 'industry' else sector).title()}")
+
+    # the company's own line items and ratios, precomputed like those of its peers if it was screened
+    # (the other tabs show the statements of the panel too), otherwise computed from the statements of the other tabs
+    if ticker in cross_section.tickers:
+        company = cross_section.values[cross_section.tickers.get_loc(ticker)]
+    else:
+        statements = {ticker: {'balance_sheet': st.session_state.balance_sheet,
+                               'income_statement': st.session_state.income_statement,
+                               'cash_flow': st.session_state.cash_flow}}
+        company = cross_section.company(metric_frame(observations(statements), ratio_table(statements)).loc[ticker])
+
+    # the statistics of every metric and year at once
+    stats = peer_statistics(cross_section.values[positions], company, cross_section.metrics, cross_section.years)
+
+    # the fiscal years the company reported, the latest first
+    years = [year for year, reported in zip(cross_section.years, ~np.isnan(company).all(axis=0)) if reported]
+    if not years:
+        st.info('The fiscal years of the company are not in the screened panels yet.')
+        return
+    year = st.selectbox(label='Fiscal Year', options=years[::-1], key='peer_year')
+
+    # one row per metric with the company, the peers' quartiles and the company's rank among the peers
+    table = stats.xs(year, level='year')[list(COLUMNS)]
+    st.dataframe(table.style.format(COLUMNS, na_rep='-'), use_container_width=True)
+
+    # the selected metric of every peer in that year, and the company against the peers over time
+    default = cross_section.metrics.get_loc('netMargin') if 'netMargin' in cross_section.metrics else 0
+    metric = st.selectbox(label='Metric', options=list(cross_section.metrics), index=default, key='peer_metric')
+    values = pd.Series(cross_section.values[positions, cross_section.metrics.get_loc(metric),
+                                            cross_section.years.get_loc(year)],
+                       index=cross_section.tickers[positions])
+    values[ticker] = company[cross_section.metrics.get_loc(metric), cross_section.years.get_loc(year)]
+    st.bar_chart(values.dropna().sort_values(ascending=False))
+    st.line_chart(stats.xs(metric, level='metric')[['company', 'p25', 'median', 'p75']])
@@ -1,32 +1,93 @@
 # Import the Streamlit library for building web apps
 import streamlit as st
-# Import the TimeSeries class from the alpha_vantage library for fetching stock data
-from alpha_vantage.timeseries import TimeSeries
-# Import the YAML library for parsing YAML files
-import yaml
+# Import the in-memory ttl of each data type, the registry of rate limited API clients and the timing spans
+from services import cache_miss, get_client, memory_ttl, register_client, timed
+# Import the server-side downsampling of chart data
+from services.downsample import CHART_WIDTH, downsample
+# Import the on-disk price store, which only fetches the bars that are newer than the stored ones
+from services.price_store import get_price_store
+
+
+def time_series():
+    # Initialize a TimeSeries object with the API key from the secrets file,
+    # the TimeSeries class of the alpha_vantage library is imported when the first prices are fetched
+    from alpha_vantage.timeseries import TimeSeries
+    return TimeSeries(key=st.secrets['alpha_vantage'], output_format='pandas')
+
+
+# the client is created on first use, its calls go through the same rate limited gateway as the other Alpha Vantage clients
+register_client('ts', time_series)
+
+
+@timed('fetch_prices')
+def fetch_prices(ticker: str, interval: str, full: bool):
+    ts = get_client('ts')
+    # Fetch the adjusted stock data for the specified ticker, the daily series can be limited to the latest 100 bars
+    if interval == 'daily':
+        data = ts.get_daily_adjusted(ticker, outputsize='full' if full else 'compact')[0]
+    else:
+        data = ts.get_weekly_adjusted(ticker)[0]
+    # Rename the columns to remove the numeric prefixes
+    data.rename(columns={'1. open': 'open', '2. high': 'high', '3. low': 'low',
+                         '4. close': 'close', '5. adjusted close': 'adjusted close',
+                         '6. volume': 'volume', '7. dividend amount': 'dividend amount',
+                         '8. split coefficient': 'split coefficient'},
+                inplace=True)
+    return data
+
+
+# Define a function for fetching weekly stock prices,
+# decorated with Streamlit's caching decorator to speed up subsequent calls
+# the price store keeps the history on disk, so only the newest bars are fetched after a restart
+@timed('weekly_prices', cache='memory')
+@st.cache_data(ttl=memory_ttl('prices'))
+@cache_miss
+def weekly_prices(ticker: str):
+    return stored_weekly_prices(ticker)
+
+
+# Define a function for reading the weekly prices from the price store, below Streamlit's cache,
+# the cache warmer calls it to refresh the stored series
+def stored_weekly_prices(ticker: str):
+    return get_price_store().prices(ticker, 'weekly', fetch_prices)
+
+
+# Define a function for fetching daily stock prices in the same way
+@timed('daily_prices', cache='memory')
+@st.cache_data(ttl=memory_ttl('daily_prices'))
+@cache_miss
+def daily_prices(ticker: str):
+    return get_price_store().prices(ticker, 'daily', fetch_prices)
+
+
+# Define a function for preparing the chart data of a date range,
+# the prices are downsampled to about one point per pixel of the chart before they are sent to the browser
+# and the result is cached per (ticker, interval, range, resolution)
+@timed('price_chart_data', cache='memory')
+@st.cache_data(ttl=memory_ttl('daily_prices'), max_entries=256)
+@cache_miss
+def price_chart_data(ticker: str, interval: str, start, end, resolution: int = CHART_WIDTH):
+    prices = daily_prices(ticker) if interval == 'Daily' else weekly_prices(ticker)
+    # a narrow range has fewer bars than the resolution and is shown in full
+    window = prices.loc[str(start):str(end)]
+    return downsample(window, ['adjusted close'], max_points=resolution)
 
 
 # Define a function for displaying a company's price chart
+@timed('company_price_chart')
 def company_price_chart():
-    # Initialize a TimeSeries object with the API key from the secrets file
-    ts = TimeSeries(key=st.secrets['alpha_vantage'], output_format='pandas')
-
-    # Define a function for fetching weekly stock prices,
-    # decorated with Streamlit's caching decorator to speed up subsequent calls
-    @st.cache_data
-    def weekly_prices(ticker: str):
-        # Fetch the weekly adjusted stock data for the specified ticker
-        data = ts.get_weekly_adjusted(ticker)[0]
-        # Rename the columns to remove the numeric prefixes
-        data.rename(columns={'1. open': 'open', '2. high': 'high', '3. low': 'low',
-                             '4. close': 'close', '5. adjusted close': 'adjusted close',
-                             '6. volume': 'volume', '7. dividend amount': 'dividend amount',
-                             '8. split coefficient': 'split coefficient'},
-                    inplace=True)
-        return data
-
-    # Fetch and store the weekly prices for the selected ticker in Streamlit's session state
-    st.session_state.weekly_prices = weekly_prices(st.session_state.selected_ticker)
-
-    # Display a line chart of the weekly prices, with the y-axis representing the adjusted close price
-    st.line_chart(st.session_state.weekly_prices, y='adjusted close')
+    # Let the user choose between weekly and daily bars
+    interval = st.radio('Interval', options=['Weekly', 'Daily'], horizontal=True, key='price_interval')
+
+    # Fetch and store the prices for the selected ticker in Streamlit's session state
+    if interval == 'Daily':
+        st.session_state.prices = daily_prices(st.session_state.selected_ticker)
+    else:
+        st.session_state.prices = weekly_prices(st.session_state.selected_ticker)
+
+    # Let the user zoom into a date range, the slider resets when the ticker or interval changes
+    first, last = st.session_state.prices.index[0].date(), st.session_state.prices.index[-1].date()
+    start, end = st.slider('Date range', min_value=first, max_value=last, value=(first, last))
+
+    # Display a line chart of the prices, with the y-axis representing the adjusted close price
+    st.line_chart(price_chart_data(st.session_state.selected_ticker, interval, start, end), y='adjusted close')
@@ -0,0 +1,49 @@
+import streamlit as st
+# Import the server-side downsampling of chart data
+from services.downsample import downsample
+# Import the memoized ratio engine
+from services.ratios import parse_formulas, ratio_table
+# Import the timing spans
+from services.metrics import timed
+
+
+@timed('company_ratios')
+def company_ratios():
+    # collect the standardized statements of the selected ticker
+    ticker = st.session_state.selected_ticker
+    statements = {ticker: {'balance_sheet': st.session_state.balance_sheet,
+                           'income_statement': st.session_state.income_statement,
+                           'cash_flow': st.session_state.cash_flow}}
+
+    # let the user add their own ratios, one "name = formula" per line,
+    # a formula can use any line item of the three statements and the standard ratios
+    st.text_area(label='Custom Ratios', key='custom_ratios',
+                 placeholder='ebitdaMargin = ebitda / totalRevenue',
+                 help='One "name = formula" per line, for example: cashRatio = '
+                      'cashAndCashEquivalentsAtCarryingValue / totalCurrentLiabilities')
+    formulas = parse_formulas(st.session_state.custom_ratios)
+
+    # compute the ratios for all fiscal years at once, the result is memoized by the content of the statements
+    ratios = ratio_table(statements, formulas)
+
+    # tell the user which of their formulas could not be evaluated
+    for name, error in ratios.attrs['errors'].items():
+        if name in formulas:
+            st.warning(f'Could not compute {name}: {error}')
+
+    # show the ratios as rows and the fiscal dates as columns, like the statements
+    table = ratios.loc[ticker].transpose()
+    st.checkbox(label='View Ratios', key='show_ratios', value=True)
+    if st.session_state.show_ratios:
+        st.dataframe(table.style.format('{:,.2f}', na_rep='-'), use_container_width=True)
+
+    # allow the user to select multiple ratios for the chart
+    st.session_state.selected_ratios = st.multiselect(
+        'Ratio',
+        options=table.index,
+        default=['grossMargin', 'netMargin', 'returnOnEquity']
+    )
+
+    # create a line chart of the selected ratios over time
+    st.line_chart(data=downsample(table.transpose(), st.session_state.selected_ratios),
+                  y=st.session_state.selected_ratios)
@@ -0,0 +1,70 @@
+"""
+Cache warmer
+
+Keeps the overview, statements, weekly prices and news of a watchlist fresh in the persistent cache,
+so users of the app get an instant answer instead of waiting on Alpha Vantage:
+
+    python warmer.py watchlist.txt --calls-per-minute 2
+
+The watchlist has one symbol per line, the first ones are refreshed first. The worker shares the cache folder
+with the app, give it only a share of the plan's quota and the app serves the rest
+(ALPHA_VANTAGE_CALLS_PER_MINUTE), so both together stay within the plan.
+"""
+# importing libraries
+import argparse
+import time
+from collections import Counter
+from datetime import timedelta
+
+from main import fiscal_calendar, warm_fetchers
+from services import get_gateway
+from services.symbols import read_tickers
+from services.warmer import CADENCE, SWEEP_INTERVAL, Warmer
+
+
+def parse_cadence(value: str) -> tuple:
+    # read a cadence such as overview=12 (in hours)
+    part, _, hours = value.partition('=')
+    if part not in CADENCE or not hours:
+        raise argparse.ArgumentTypeError(f"expected <part>=<hours> with a part of {', '.join(CADENCE)}")
+    return part, timedelta(hours=float(hours))
+
+
+def report(results: dict):
+    # print one line per sweep and the parts that failed
+    counts = Counter(results.values())
+    print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} checked {len(results)} parts: "
+          + ', '.join(f'{number} {result}' for result, number in sorted(counts.items())), flush=True)
+    for (ticker, part), result in results.items():
+        if result != 'ok':
+            print(f'  {ticker} {part}: {result}', flush=True)
+
+
+def run(tickers: list, calls_per_minute, cadence: dict, sweep_minutes: float, once: bool):
+    if calls_per_minute is not None:
+        get_gateway().set_quota(calls_per_minute)
+    print(f'Warming {len(tickers)} tickers with {get_gateway().calls_per_minute:g} calls per minute', flush=True)
+    warmer = Warmer(tickers, warm_fetchers, fiscal_calendar, cadence=cadence,
+                    sweep_interval=timedelta(minutes=sweep_minutes))
+    try:
+        warmer.run(once=once, report=report)
+    except KeyboardInterrupt:
+        warmer.stop()
+
+
+# check if the script is running in the main scope
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keep the data of a watchlist fresh in the persistent cache')
+    parser.add_argument('watchlist', help='file with one ticker per line, in priority order')
+    parser.add_argument('--calls-per-minute', type=float, default=None,
+                        help="this worker's share of the Alpha Vantage quota (default: ALPHA_VANTAGE_CALLS_PER_MINUTE)")
+    parser.add_argument('--cadence', type=parse_cadence, action='append', default=[],
+                        help='refresh a part every so many hours, for example --cadence news=0.5 '
+                             f"(parts: {', '.join(CADENCE)}, default: the ttl of each part)")
+    parser.add_argument('--sweep-minutes', type=float, default=SWEEP_INTERVAL.total_seconds() / 60,
+                        help='minutes between the starts of two sweeps over the watchlist')
+    parser.add_argument('--once', action='store_true', help='sweep the watchlist once and exit')
+    args = parser.parse_args()
+
+    run(tickers=read_tickers(args.watchlist), calls_per_minute=args.calls_per_minute, cadence=dict(args.cadence),
+        sweep_minutes=args.sweep_minutes, once=args.once)